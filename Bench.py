@@ -0,0 +1,241 @@
+''' Headless benchmark runner for KillerWorms2
+
+    Runs the game under SDL's dummy video and audio drivers with a fixed
+    RNG seed, a fixed time step and scripted input, then prints frame
+    timings and entity counts as JSON.
+
+    python Bench.py                      # run every built-in scenario
+    python Bench.py stress dive          # run the named scenarios
+    python Bench.py -f my_scenario.json  # run scenarios from a file
+    python Bench.py -r session.json      # replay a recorded session
+
+    A scenario is a dict:
+        name      scenario name
+        frames    number of frames to simulate
+        seed      RNG seed (defaults to --seed)
+        megaman, samus, warthog, ai_worms
+                  starting populations, spread over the +-2 screen band
+        input     list of {"frames": n, "keys": ["UP", "LEFT", ...]} steps,
+                  held for n frames each and looped until the run ends
+        dirty_rects
+                  true to draw with the dirty rectangle renderer
+        replay    a session recorded with Main.py --record; its seed,
+                  steps and key events replace seed, frames, the
+                  populations and input
+        render    false to skip drawing (replays only)
+        offload   true to simulate particles and enemy decisions in a
+                  worker process (not with replay)
+    '''
+import os, sys
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+launch_dir = os.getcwd()
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse, json, random
+from timeit import default_timer as timer
+import pygame
+import scripts.enemies as enemies
+import scripts.rotcache as rotcache
+from scripts.broadphase import AxisIndex
+from scripts.entities import EntityStore
+from scripts.replay import Recording, Replayer
+from Main import KillerWorms2
+
+DIVE = [{"frames": 25, "keys": ["UP"]},
+        {"frames": 8, "keys": ["UP", "LEFT"]},
+        {"frames": 30, "keys": ["UP"]},
+        {"frames": 8, "keys": ["UP", "RIGHT"]},
+        {"frames": 15, "keys": []}]
+
+SCENARIOS = [
+    {"name": "default", "frames": 600,
+     "megaman": 10, "samus": 5, "warthog": 3, "ai_worms": 10,
+     "input": [{"frames": 30, "keys": ["RIGHT"]},
+               {"frames": 60, "keys": []}]},
+    {"name": "dive", "frames": 900,
+     "megaman": 40, "samus": 20, "warthog": 10, "ai_worms": 20,
+     "input": DIVE},
+    {"name": "idle", "frames": 600, "dirty_rects": True,
+     "megaman": 10, "samus": 5, "warthog": 3, "ai_worms": 10,
+     "input": [{"frames": 1, "keys": ["RIGHT"]}]},
+    {"name": "stress", "frames": 900,
+     "megaman": 500, "samus": 100, "warthog": 50, "ai_worms": 10,
+     "input": DIVE},
+]
+
+def percentile(values, pct):
+    if not values: return 0.0
+    ordered = sorted(values)
+    index = int(round(pct / 100.0 * (len(ordered) - 1)))
+    return ordered[index]
+
+def summary(values):
+    if not values: return {}
+    return {"mean": sum(values) / len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values)}
+
+class BenchGame(KillerWorms2):
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.dirty_mode = scenario.get("dirty_rects", False)
+        self.offload = scenario.get("offload", False)
+        if self.offload and "replay" in scenario:
+            raise ValueError("a replay cannot run with a worker process")
+        self.session = None
+        if "replay" in scenario:
+            self.session = Recording.load(scenario["replay"])
+            scenario["seed"] = self.session.seed
+            scenario["frames"] = len(self.session.steps)
+        self.profile_history = scenario["frames"]
+
+    def init(self):
+        super(BenchGame, self).init()
+        if self.session is not None: return
+        scenario = self.scenario
+        self.enemies = EntityStore()
+        self.enemy_index = AxisIndex()
+        self.enemies_dying = 0
+        self.worms.clear()
+        for _ in xrange(scenario.get("megaman", 0)):
+            self.add_enemy(enemies.Megaman(
+                self.screen, self.cam, self.spawn_pos(enemies.Megaman),
+                random.choice(["l", "r"])))
+        for _ in xrange(scenario.get("samus", 0)):
+            self.add_enemy(enemies.Samus(
+                self.screen, self.cam, self.spawn_pos(enemies.Samus),
+                random.choice(["l", "r"]), self.bullets))
+        for _ in xrange(scenario.get("warthog", 0)):
+            self.add_enemy(enemies.Warthog(
+                self.screen, self.cam, self.spawn_pos(enemies.Warthog),
+                random.choice(["l", "r"]), self.bullets))
+        for _ in xrange(scenario.get("ai_worms", 0)):
+            self.new_worm()
+        self.enemies_alive = len(self.enemies)
+
+    def spawn_pos(self, enemy_cls):
+        band = 2*self.cam.width
+        x = self.worm.pos.x + random.randint(-band, band)
+        return (x, self.ground_y - enemy_cls.y_sep)
+
+    def input_keys(self, frame):
+        steps = self.scenario.get("input", [])
+        total = sum(step["frames"] for step in steps)
+        if total == 0: return set()
+        frame %= total
+        for step in steps:
+            if frame < step["frames"]:
+                return set(getattr(pygame, "K_" + key) for key in step["keys"])
+            frame -= step["frames"]
+
+    def apply_input(self, frame):
+        keys = self.input_keys(frame)
+        for key, down in self.key_dict.items():
+            if down and key not in keys: self._key_released(key)
+        for key in keys:
+            if not self.is_key_down(key): self._key_pressed(key)
+
+    def dirty_stats(self):
+        if self.dirty is None: return None
+        return {"full_frames": self.dirty.full_frames,
+                "partial_frames": self.dirty.partial_frames}
+
+    def bench(self, fps=30):
+        pygame.init()
+        self.fps = fps
+        self.screen_width, self.screen_height = 1200, 890
+        if self.session is not None:
+            self.screen_width, self.screen_height = self.session.screen_size
+        self._init()
+        rotcache.cache.reset_stats()
+        replayer = None
+        if self.session is not None:
+            replayer = Replayer(self, self.session)
+        render = self.scenario.get("render", True)
+        time_passed = 1.0 / fps
+        timer_times, redraw_times, frame_times = [], [], []
+        peak = self.entity_counts()
+        profiler = self.profiler
+        for frame in xrange(self.scenario["frames"]):
+            pygame.event.pump()
+            if replayer is None: self.apply_input(frame)
+            profiler.begin_frame()
+            start = timer()
+            if replayer is None: self._timer_fired(time_passed)
+            else: replayer.step(frame)
+            fired = timer()
+            if render: self._redraw_all()
+            drawn = timer()
+            self._end_frame()
+            timer_times.append((fired - start) * 1000)
+            redraw_times.append((drawn - fired) * 1000)
+            frame_times.append((drawn - start) * 1000)
+            counts = profiler.history[-1][1]
+            for name, count in counts.items():
+                peak[name] = max(peak[name], count)
+        self.exit()
+        return {"name": self.scenario["name"],
+                "seed": self.scenario["seed"],
+                "frames": self.scenario["frames"],
+                "frame_ms": summary(frame_times),
+                "timer_fired_ms": summary(timer_times),
+                "redraw_all_ms": summary(redraw_times),
+                "entities": {"final": self.entity_counts(), "peak": peak},
+                "rotation_cache": rotcache.cache.stats(),
+                "bullet_pool": enemies.Bullet.pool.stats(),
+                "sound": self.sound_man.stats(),
+                "dirty_rects": self.dirty_stats(),
+                "replay_mismatches": (None if replayer is None
+                                      else replayer.mismatches),
+                "sections_ms": dict((name, summary(profiler.column(name)))
+                                    for name in profiler.names),
+                "per_frame": {"timer_fired_ms": timer_times,
+                              "redraw_all_ms": redraw_times}}
+
+def run_scenario(scenario, seed):
+    scenario = dict(scenario)
+    scenario.setdefault("seed", seed)
+    game = BenchGame(scenario)
+    random.seed(scenario["seed"])
+    return game.bench()
+
+def main():
+    parser = argparse.ArgumentParser(description="KillerWorms2 benchmarks")
+    parser.add_argument("names", nargs="*", help="built-in scenarios to run")
+    parser.add_argument("-f", "--file", help="JSON file of scenarios")
+    parser.add_argument("-r", "--replay", action="append", default=[],
+                        help="recorded session to replay")
+    parser.add_argument("--no-render", action="store_true",
+                        help="do not draw replayed sessions")
+    parser.add_argument("-s", "--seed", type=int, default=112)
+    parser.add_argument("-o", "--out", help="write results here")
+    parser.add_argument("--no-per-frame", action="store_true",
+                        help="omit per-frame timings from the output")
+    args = parser.parse_args()
+    scenarios = SCENARIOS
+    if args.file:
+        with open(args.file, 'r') as f:
+            scenarios = json.load(f)
+        if isinstance(scenarios, dict): scenarios = [scenarios]
+    if args.names:
+        known = dict((s["name"], s) for s in scenarios)
+        scenarios = [known[name] for name in args.names]
+    if args.replay:
+        replays = [{"name": os.path.basename(path),
+                    "replay": os.path.join(launch_dir, path),
+                    "render": not args.no_render} for path in args.replay]
+        scenarios = (scenarios if args.names or args.file else []) + replays
+    results = [run_scenario(scenario, args.seed) for scenario in scenarios]
+    if args.no_per_frame:
+        for result in results: del result["per_frame"]
+    out = open(args.out, 'w') if args.out else sys.stdout
+    json.dump(results, out, indent=2, sort_keys=True)
+    out.write('\n')
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
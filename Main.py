@@ -1,89 +1,146 @@
 from scripts.pygamegame import PygameGame
 from scripts.camera import Camera
-import pygame, random
+import pygame, random, sys, os
 import scripts.enemies as enemies
 from scripts.vec2d import vec2d
-from scripts.worm import Worm, AIWorm
-from scripts.blood import BloodExplosion
+from scripts.worm import Worm
+from scripts.swarm import WormSwarm
+from scripts.blood import BloodSystem
+from scripts.offload import Worker
 from scripts.text import FontManager
 from scripts.sound import SoundManager
+from scripts.broadphase import AxisIndex
+from scripts.entities import EntityStore
+from scripts.parallax import ParallaxLayer
+from scripts.assets import AssetLoader
+from scripts.lod import LODPolicy
+from scripts.world import LevelWorld
+import scripts.assets as assets
+import scripts.atlas as atlas
 
 WHITE = (255, 255, 255)
+HUD_KEY = (255, 0, 255)
 
-class Background(pygame.sprite.Sprite):
-    def __init__(self, screen, filename, screen_width, screen_height, camera):
-        super(Background, self).__init__()
-        self.screen = screen
-        self.base_image = pygame.image.load(filename).convert_alpha()
-        self.screen_width = screen_width
-        self.screen_height = screen_height
-        self.camera = camera
-
-    def blit_me(self):
-        left = self.camera.left % self.screen_width
-        left_dest = pygame.Rect(self.screen_width-left+1, 0,
-                        self.screen_width, self.screen_height)
-        left_area = pygame.Rect(0, 0, left, self.screen_height)
-        right_dest = pygame.Rect(0, 0, left, self.screen_height)
-        right_area = pygame.Rect(left, 0, self.screen_width, self.screen_height)
-        im = self.base_image
-        self.screen.blit(im, left_dest, left_area)
-        self.screen.blit(im, right_dest, right_area)
+IMAGES = ['images/icon.png', 'images/worm/worm_piece.png',
+          'images/ai_piece.png', 'images/worm/worm_small_fang.png',
+          'images/bg/close.png', 'images/bg/far.jpg', 'images/bg/mid.png']
+
+# every file decoded at startup, so init() only converts from the cache #
+def asset_paths():
+    paths = list(IMAGES)
+    for folder in atlas.FOLDERS:
+        paths.extend(atlas.frame_paths(folder))
+    for sound_type in sorted(os.listdir('sounds')):
+        folder = os.path.join('sounds', sound_type)
+        paths.extend(os.path.join(folder, sound)
+                     for sound in sorted(os.listdir(folder)))
+    return paths
 
 class KillerWorms2(PygameGame):
+    dirty_mode = False
+    # simulate particles and enemy decisions in a worker process #
+    offload = False
+
     def key_pressed(self, key):
         if key == pygame.K_w:
-            self.enemies.append(enemies.Warthog.on_screen(
+            self.add_enemy(enemies.Warthog.on_screen(
                     self.screen, self.cam, self.screen_width,
                     self.ground_y, self.bullets))
         elif key == pygame.K_s:
-            self.enemies.append(enemies.Samus.on_screen(
+            self.add_enemy(enemies.Samus.on_screen(
                     self.screen, self.cam, self.screen_width,
                     self.ground_y, self.bullets))
         elif key == pygame.K_m:
-            self.enemies.append(enemies.Megaman.on_screen(
+            self.add_enemy(enemies.Megaman.on_screen(
                     self.screen, self.cam, self.screen_width,
                     self.ground_y))
 
     def init(self):
+        self.arial30 = FontManager("arial", 30)
+        self.load_assets()
         Worm.init()
+        WormSwarm.init()
         pygame.display.set_icon(
-                    pygame.image.load('images/icon.png').convert_alpha())
+                    assets.image('images/icon.png').convert_alpha())
         enemies.init()
-        self.arial30 = FontManager("arial", 30)
         self.cam = Camera(0, 0, self.screen_width, self.screen_height)
-        self.ground = Background(self.screen, 'images/bg/close.png',
-            self.screen_width, self.screen_height, self.cam)
+        self.ground = ParallaxLayer(self.screen, self.cam,
+                                    'images/bg/close.png')
         self.slow_cam = Camera(0, 0, self.screen_width, self.screen_height)
-        self.sky = Background(self.screen, 'images/bg/far.jpg',
-            self.screen_width, self.screen_height, self.slow_cam)
+        self.sky = ParallaxLayer(self.screen, self.slow_cam,
+                                 'images/bg/far.jpg')
         self.mid_cam = Camera(0, 0, self.screen_width, self.screen_height)
-        self.mid_ground = Background(self.screen, 'images/bg/mid.png',
-            self.screen_width, self.screen_height, self.mid_cam)
+        self.mid_ground = ParallaxLayer(self.screen, self.mid_cam,
+                                        'images/bg/mid.png')
         self.ground_y = 440
         self.worm = Worm(self.screen, vec2d(600, 665), 10, self.key_dict,
                         self.ground_y, self.cam)
-        self.enemies = []
-        self.bullets = []
+        self.fang_radius = 70
+        self.enemies = EntityStore()
+        self.enemy_index = AxisIndex()
+        self.enemies_dying = 0
+        self.lod = LODPolicy(self.cam)
+        self.bullets = EntityStore()
         for _ in xrange(10):
-            self.enemies.append(enemies.Megaman.on_screen(
+            self.add_enemy(enemies.Megaman.on_screen(
                     self.screen, self.cam, self.screen_width,
                     self.ground_y))
         for _ in xrange(5):
-            self.enemies.append(enemies.Samus.on_screen(
+            self.add_enemy(enemies.Samus.on_screen(
                     self.screen, self.cam, self.screen_width,
                     self.ground_y, self.bullets))
         for _ in xrange(3):
-            self.enemies.append(enemies.Warthog.on_screen(
+            self.add_enemy(enemies.Warthog.on_screen(
                     self.screen, self.cam, self.screen_width,
                     self.ground_y, self.bullets))
-        self.worms = []
+        self.worms = WormSwarm(self.screen, self.cam, self.ground_y)
         for _ in xrange(10):
             self.new_worm()
-        self.bloods = []
+        if self.offload:
+            self.worker = Worker(self.screen, [enemies.Megaman, enemies.Samus,
+                                               enemies.Warthog])
+            self.blood = self.worker.blood
+            self.worm.dirt_list = self.worker.dirt
+            enemies.Warthog.fire_type = self.worker.fire
+        else:
+            self.blood = BloodSystem(self.screen)
+            enemies.Warthog.fire_type = enemies.Fire
+        self.world = LevelWorld(self)
+        self.world.start(self.cam.center.x)
+        hud_top = self.screen_height - 50 - self.arial30.height
+        self.hud_rect = pygame.Rect(0, hud_top, self.screen_width,
+                                    self.screen_height - hud_top)
+        # the HUD can be drawn before the first simulation step #
+        self.enemies_alive = len(self.enemies)
+        self.init_hud()
+        self.hud_key = None
+        self.use_dirty_rects(self.dirty_mode)
         self.sound_man = SoundManager()
-        self.scream_time = 0.0
-        self.next_scream = random.random()*0.5 + 0.25
+
+    def load_assets(self):
+        loader = AssetLoader()
+        loader.start(asset_paths())
+        while not loader.done():
+            pygame.event.pump()
+            self.draw_loading(loader.progress())
+            pygame.display.flip()
+            pygame.time.wait(10)
+        loader.join()
+        self.draw_loading(1.0)
+        pygame.display.flip()
+
+    def draw_loading(self, progress):
+        self.screen.fill((0, 0, 0))
+        width, height = 400, 20
+        x = (self.screen_width - width) / 2
+        y = (self.screen_height - height) / 2
+        pygame.draw.rect(self.screen, WHITE, (x, y, width, height), 2)
+        pygame.draw.rect(self.screen, WHITE,
+                         (x, y, int(width * progress), height))
+        text = "LOADING"
+        text_x = (self.screen_width - self.arial30.size(text)[0]) / 2
+        self.arial30.write(self.screen, text_x, y - 10 - self.arial30.height,
+                           text, WHITE)
 
     def new_worm(self, off_screen=False):
         x = random.randint(-self.cam.width, 2*self.cam.width)
@@ -92,131 +149,284 @@ class KillerWorms2(PygameGame):
             x = random.randint(-self.cam.width, 2*self.cam.width)
             x += self.cam.center.x
         y = random.randint(self.ground_y+50, self.screen_height-100)
-        self.worms.append(AIWorm(
-                self.screen, vec2d(x, y), self.ground_y,
-                self.cam))
+        self.worms.spawn(x, y)
+
+    def add_enemy(self, enemy):
+        enemy.eid = self.enemies.add(enemy)
+        self.enemy_index.add(enemy)
+        self.lod.track(enemy)
+
+    def remove_enemy(self, enemy):
+        self.enemies.remove(enemy.eid)
+        self.enemy_index.remove(enemy)
+        if enemy.dead: self.enemies_dying -= 1
 
     def update_enemies(self, time_passed):
-        self.scream_time += time_passed
-        enemy_count = len(self.enemies)
-        enemies_alive = 0
-        i = 0
+        self.sound_man.update(time_passed)
+        worm, head = self.worm, self.worm.head
+        lod = self.lod
+        lod.begin(self.enemy_index)
+        if self.offload: self.worker.receive()
+        for enemy_type, group in self.enemies.by_type():
+            if enemy_type.lod:
+                near, far = lod.split(enemy_type, group)
+                steps = lod.catch_up(far)
+            else: near, far, steps = group, [], []
+            if self.offload:
+                self.worker.update_enemies(enemy_type, self.enemies, near, far,
+                                           steps, time_passed, worm)
+            else:
+                enemy_type.update_all(near, time_passed, worm)
+                enemy_type.update_far(far, steps, worm)
+        enemies_alive = (len(self.enemies) - self.enemies_dying +
+                         self.world.dormant_enemies)
+        self.enemy_index.update()
         close = False
-        while i < enemy_count:
-            enemy = self.enemies[i]
-            dist = enemy.update(time_passed, self.worm)
-            if dist < 70: close = True
-            if not enemy.dead: enemies_alive += 1
-            if (dist < self.worm.head.radius+enemy.death_radius and
-                not self.worm.head.in_ground() and
-                not enemy.dead):
-                if self.scream_time > self.next_scream:
-                    enemy.death_sound(self.sound_man)
-                    self.scream_time = 0
-                    self.next_scream = random.random()*0.5 + 0.25
-                enemy.die(self.worm.head.velocity)
+        attacking = not head.in_ground()
+        for enemy, dist_sqrd in self.enemy_index.near(worm.pos,
+                                                      self.fang_radius):
+            if enemy.dead: continue
+            close = True
+            kill_radius = head.radius + enemy.death_radius
+            if attacking and dist_sqrd < kill_radius*kill_radius:
+                enemy.death_sound(self.sound_man)
+                enemy.die(head.velocity)
+                if enemy.dead: self.enemies_dying += 1
                 if isinstance(enemy, enemies.OrganicEnemy):
-                    self.bloods.append(enemy.new_blood(self.ground_y))
-            if enemy.gone:
-                self.enemies.pop(i)
-                enemy_count -= 1
-            else:
-                i += 1
+                    enemy.new_blood(self.blood, self.ground_y)
+        for enemy in self.enemies.remove_if(lambda enemy: enemy.gone):
+            self.enemy_index.remove(enemy)
+            if enemy.dead: self.enemies_dying -= 1
         self.enemies_alive = enemies_alive
         return close
 
     def update_worms(self, time_passed):
-        close = False
-        worm_count = len(self.worms)
-        i = 0
-        while i < worm_count:
-            worm = self.worms[i]
-            dist = worm.update(time_passed, self.worm)
-            if dist < 70: close = True
-            if dist < self.worm.head.radius:
-                self.worms.pop(i)
-                worm_count -= 1
-                self.worm.health = min(self.worm.max_health,
-                                        self.worm.health+10)
-                self.new_worm(True)
-            else: i += 1
-        return close
+        self.worms.update(time_passed)
+        head = self.worm.head
+        near = self.worms.near(self.worm.pos, self.fang_radius)
+        eaten = [i for i, dist_sqrd in near
+                 if dist_sqrd < head.radius*head.radius]
+        # highest index first, removing swaps the last worm in #
+        for i in sorted(eaten, reverse=True):
+            self.worms.remove(i)
+            self.worm.health = min(self.worm.max_health,
+                                    self.worm.health+10)
+        for i in eaten:
+            self.new_worm(True)
+        return len(near) > 0
+
+    def remember_state(self):
+        for camera in (self.cam, self.mid_cam, self.slow_cam):
+            camera.remember_pos()
+        self.worm.remember_pos()
+        # far enemies are not drawn, the near ones of the last step are #
+        # the only ones that can come into view in this one             #
+        for enemy in self.lod.near:
+            enemy.remember_pos()
+        for bullet in self.bullets:
+            bullet.remember_pos()
+        self.worms.remember_pos()
+
+    def interpolate(self, alpha):
+        for camera in (self.cam, self.mid_cam, self.slow_cam):
+            camera.interpolate(alpha)
+        if self.offload: self.worker.sync()
+
+    def exit(self):
+        if self.offload: self.worker.close()
 
     def timer_fired(self, time_passed):
+        section = self.profiler.section
         if self.is_key_down(pygame.K_h): self.worm.health -= 10
-        self.worm.update(time_passed)
-        close = (self.update_enemies(time_passed) or
-                 self.update_worms(time_passed))
-        self.worm.fangs.opened = close
-        b = 0
-        blood_count = len(self.bloods)
-        while blood_count > 7:
-            self.bloods.pop(0)
-            blood_count -= 1
-        while b < blood_count:
-            blood = self.bloods[b]
-            blood.update(self.cam)
-            if blood.blood_pieces == []:
-                self.bloods.pop(b)
-                blood_count -= 1
-            else: b += 1
-        b = 0
-        bullet_count = len(self.bullets)
-        while b < bullet_count:
-            bullet = self.bullets[b]
-            if not bullet.update(time_passed, self.ground_y):
-                self.bullets.pop(b)
-                bullet_count -= 1
-            else: b += 1
-        self.mid_cam.pos = self.cam.pos / 2
-        self.slow_cam.pos = self.cam.pos / 4
+        with section("worm"):
+            self.worm.update(time_passed)
+        with section("world"):
+            self.world.update(self.cam.center.x)
+        with section("enemies"):
+            enemies_close = self.update_enemies(time_passed)
+        with section("ai_worms"):
+            worms_close = self.update_worms(time_passed)
+        self.worm.fangs.opened = enemies_close or worms_close
+        with section("blood"):
+            self.blood.update(time_passed)
+        ground_y = self.ground_y
+        with section("bullets"):
+            for bullet in self.bullets.remove_if(
+                    lambda bullet: not bullet.update(time_passed, ground_y)):
+                enemies.Bullet.pool.release(bullet)
+        with section("parallax"):
+            self.mid_cam.pos = self.cam.pos / 2
+            self.slow_cam.pos = self.cam.pos / 4
+        if self.offload:
+            with section("offload"):
+                self.worker.step(time_passed, self.worm)
 
     def draw_bg(self):
         self.sky.blit_me()
         self.mid_ground.blit_me()
 
-    def draw_enemy_count(self):
+    def init_hud(self):
+        margin, bar_height = 60, 20
+        width = self.screen_width - 2 * margin
+        self.hud_fill = pygame.Surface((width, bar_height))
+        # one pixel of padding: thick outlines are centred on the edge #
+        self.hud_outline = pygame.Surface((width + 2, bar_height + 2))
+        self.hud_outline.fill(HUD_KEY)
+        pygame.draw.rect(self.hud_outline, WHITE, (1, 1, width, bar_height), 3)
+        self.hud_outline.set_colorkey(HUD_KEY, pygame.RLEACCEL)
+        self.hud_blits = []
+        self.hud_key = None
+
+    # HUD state as drawn; the HUD blits are rebuilt when this changes #
+    def hud_state(self):
+        width = self.hud_fill.get_width()
+        health_width = int(1.0*width*self.worm.health/self.worm.max_health)
+        health_red = min(230, 230*self.worm.health/(self.worm.max_health/3))
+        health_red = int(max(health_red, 0))
+        return health_width, health_red, self.enemies_alive
+
+    def update_hud(self):
+        key = self.hud_state()
+        if key == self.hud_key: return False
+        health_width, health_red, enemies_alive = key
+        if self.hud_key is None or health_red != self.hud_key[1]:
+            self.hud_fill.fill((230, health_red, health_red))
+        self.hud_key = key
+        self.hud_blits = (self.draw_health(health_width) +
+                          self.draw_enemy_count(enemies_alive))
+        return True
+
+    def draw_hud(self):
+        self.update_hud()
+        blit = self.screen.blit
+        for surface, pos, area in self.hud_blits:
+            blit(surface, pos, area)
+
+    # the draw_ functions return the (surface, pos, area) blits of a part #
+    def draw_enemy_count(self, enemies_alive):
         margin = 60
         text_y = self.screen_height - 50 - self.arial30.height
-        text = "ENEMIES LEFT: %d" % self.enemies_alive
-        width, height = self.arial30.size(text)
-        text_x = self.screen_width-margin-width
-        self.arial30.write(self.screen, text_x, text_y, text, (255, 255, 255))
+        text = "ENEMIES LEFT: %d" % enemies_alive
+        text_surf = self.arial30.render_cached(text, WHITE)
+        text_x = self.screen_width-margin-text_surf.get_width()
+        return [(text_surf, (text_x, text_y), None)]
 
-    def draw_health(self):
+    def draw_health(self, health_width):
         margin = 60
-        width = self.screen_width - 2 * margin
         health_top = self.screen_height - 50
         text_y = health_top - self.arial30.height
-        self.arial30.write(self.screen, margin, text_y, "HEALTH", WHITE)
-        health_height = 20
-        outline_rect = pygame.Rect(margin, health_top, width, health_height)
-        health_width = 1.0*width*self.worm.health/self.worm.max_health
-        health_rect = pygame.Rect(margin, health_top,
-                                  health_width, health_height)
-        health_red = min(230, 230*self.worm.health/(self.worm.max_health/3))
-        health_color = (230, max(health_red, 0), max(health_red, 0))
-        pygame.draw.rect(self.screen, health_color, health_rect)
-        pygame.draw.rect(self.screen, WHITE, outline_rect, 3)
+        blits = [(self.arial30.render_cached("HEALTH", WHITE),
+                  (margin, text_y), None)]
+        if health_width > 0:
+            blits.append((self.hud_fill, (margin, health_top),
+                          (0, 0, health_width, self.hud_fill.get_height())))
+        blits.append((self.hud_outline, (margin - 1, health_top - 1), None))
+        return blits
 
-    def redraw_all(self):
-        self.draw_bg()
-        for enemy in self.enemies:
-            enemy.blit_me()
-        self.ground.blit_me()
-        self.worm.draw_dirts()
-        for blood in self.bloods:
-            blood.blit_me(self.cam)
+    def entity_counts(self):
+        return {"enemies": len(self.enemies),
+                "megaman": len(self.enemies.of_type(enemies.Megaman)),
+                "samus": len(self.enemies.of_type(enemies.Samus)),
+                "warthog": len(self.enemies.of_type(enemies.Warthog)),
+                "ai_worms": len(self.worms),
+                "bullets": len(self.bullets),
+                "blood": len(self.blood),
+                "dormant": self.world.dormant_count}
+
+    def state_key(self):
+        worm = self.worm
+        return (worm.pos.x, worm.pos.y, worm.health,
+                [(e.pos.x, e.pos.y, e.dead) for e in self.enemies],
+                [(b.pos.x, b.pos.y) for b in self.bullets],
+                self.worms.pos[:len(self.worms)].tostring(),
+                self.blood.spawned)
+
+    # enemies close enough to the drawn view to show, type by type #
+    def enemies_in_view(self, margin=300):
+        cam = self.cam
+        half = cam.width / 2
+        near = self.enemy_index.query(cam.draw_pos.x + half, half + margin)
+        order = dict((enemy_type, i) for i, (enemy_type, group)
+                     in enumerate(self.enemies.by_type()))
+        near.sort(key=lambda enemy: order[type(enemy)])
+        return near
+
+    def view_key(self):
+        return tuple((int(camera.draw_pos.x), int(camera.draw_pos.y))
+                     for camera in (self.cam, self.mid_cam, self.slow_cam))
+
+    def dirty_rects(self, tracker):
+        for enemy in self.enemies_in_view():
+            enemy.mark_dirty(tracker)
+        self.blood.mark_dirty(tracker, self.cam)
         for bullet in self.bullets:
-            bullet.blit_me()
-        for worm in self.worms:
-            worm.blit_me()
-        self.worm.draw()
-        self.draw_health()
-        self.draw_enemy_count()
-
-    def run(self):
-        self.fps = 30
-        super(KillerWorms2, self).run(1200, 890, self.fps, "KILLER WORM")
-
-KillerWorms2().run()
\ No newline at end of file
+            bullet.mark_dirty(tracker)
+        self.worms.mark_dirty(tracker)
+        self.worm.mark_dirty(tracker)
+        if self.update_hud(): tracker.add(self.hud_rect)
+
+    def redraw_all(self):
+        section = self.profiler.section
+        with section("draw_bg"):
+            self.draw_bg()
+        cull = self.cam.cull
+        with section("draw_enemies"):
+            enemy_list = self.enemies_in_view()
+            for enemy in cull(enemy_list,
+                              [e.draw_bounds() for e in enemy_list]):
+                enemy.blit_me()
+        with section("draw_ground"):
+            self.ground.blit_me()
+            self.worm.draw_dirts()
+        with section("draw_blood"):
+            self.blood.blit_me(self.cam)
+        with section("draw_bullets"):
+            bullets = list(self.bullets)
+            for bullet in cull(bullets, [b.draw_bounds() for b in bullets]):
+                bullet.blit_me()
+        with section("draw_ai_worms"):
+            self.worms.blit_me()
+        with section("draw_worm"):
+            self.worm.draw()
+        with section("draw_hud"):
+            self.draw_hud()
+
+    def run(self, fps=60, dirty_rects=False, profile_csv=None, record=None,
+            offload=False):
+        # which step a worker's results arrive in varies from run to run #
+        if offload and record:
+            raise ValueError("a run with a worker process cannot be recorded")
+        self.fps = fps
+        self.dirty_mode = dirty_rects
+        self.offload = offload
+        self.sim_fps = 30
+        super(KillerWorms2, self).run(1200, 890, self.fps, "KILLER WORM",
+                                      self.sim_fps, profile_csv=profile_csv,
+                                      record=record)
+
+    def replay(self, path, render=False):
+        return super(KillerWorms2, self).replay(path, 30, "KILLER WORM",
+                                                render)
+
+# Main.py [--dirty-rects] [--workers] [--profile out.csv] #
+#         [--record session.json]                          #
+# Main.py --replay session.json [--render]                 #
+def arg_value(name):
+    if name not in sys.argv[:-1]: return None
+    return sys.argv[sys.argv.index(name) + 1]
+
+if __name__ == "__main__":
+    if "--workers" in sys.argv and (arg_value("--record") or
+                                    arg_value("--replay")):
+        sys.exit("--workers cannot be combined with --record or --replay")
+    if arg_value("--replay"):
+        if "--render" not in sys.argv:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        mismatches = KillerWorms2().replay(arg_value("--replay"),
+                                           render="--render" in sys.argv)
+        sys.exit(1 if mismatches else 0)
+    KillerWorms2().run(dirty_rects="--dirty-rects" in sys.argv,
+                       profile_csv=arg_value("--profile"),
+                       record=arg_value("--record"),
+                       offload="--workers" in sys.argv)
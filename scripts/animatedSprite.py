@@ -1,24 +1,38 @@
 import pygame, sys
 from vec2d import vec2d
 from camera import Camera
+import rotcache
+import atlas
 
 class ImageHolder(object):
     @classmethod
-    def load_anim(cls, folder, anim):
-        path = 'images/%s/%s' % (folder, anim)
-        with open('%s/times.txt' % path, 'r') as times:
-            lines = times.read().split('\n')
-        fc = int(lines[0])
-        frame_times = [float(lines[i]) for i in xrange(1, fc+1)]
-        images = [pygame.image.load('%s/%d.png' % (path, i))
-                            for i in xrange(fc)]
-        return ImageHolder(fc, frame_times, images, anim)
+    def load_anim(cls, folder, anim, mirror=False):
+        sheet = atlas.load(folder)
+        if sheet is not None and anim in sheet[1]:
+            surface, index = sheet
+            frame_times, rects = index[anim]
+            images = [surface.subsurface(rect) for rect in rects]
+        else:
+            frame_times, images = atlas.read_anim('images/%s/%s' % (folder,
+                                                                   anim))
+        holder = ImageHolder(len(images), frame_times, images, anim)
+        if mirror: holder.mirrored()
+        return holder
 
     def __init__(self, frame_count, frame_times, images, name):
         self.frame_count = frame_count
         self.frame_times = frame_times
         self.images = images
         self.name = name
+        self.sizes = [image.get_size() for image in images]
+        self.mirrored_images = None
+
+    # horizontally flipped frames, built once on first use #
+    def mirrored(self):
+        if self.mirrored_images is None:
+            self.mirrored_images = [pygame.transform.flip(image, True, False)
+                                    for image in self.images]
+        return self.mirrored_images
 
     def read(self):
         return (self.name,
@@ -30,19 +44,50 @@ class ImageHolder(object):
         return self.name
 
 class Animation(object):
+    ''' Per-sprite playhead over a shared ImageHolder
+        frame data lives in the holder, only playback state lives here
+        '''
+    __slots__ = ['img_holder', 'frame', 'time', 'rotation', 'playing',
+                 'time_scale', 'base_frame', 'image', 'image_rotation',
+                 'world_pos']
+
     def __init__(self, img_holder):
-        n, self.frame_count, self.frame_times, self.images = img_holder.read()
-        self.base_image = self.images[0]
-        self.image = self.base_image
-        self.image_w, self.image_h = self.image.get_size()
-        self.playing = False
+        self.img_holder = img_holder
+        self.frame = 0
         self.time = 0.0
         self.rotation = 0
-    
+        self.playing = False
+        self.time_scale = 1.0
+        self.base_frame = 0
+        self.image = img_holder.images[0]
+        self.image_rotation = 0
+
+    def _get_name(self): return self.img_holder.name
+    name = property(_get_name, None, None, '')
+
+    def _get_frame_count(self): return self.img_holder.frame_count
+    frame_count = property(_get_frame_count, None, None, '')
+
+    def _get_frame_times(self): return self.img_holder.frame_times
+    frame_times = property(_get_frame_times, None, None, '')
+
+    def _get_base_image(self):
+        return self.img_holder.images[self.base_frame]
+    base_image = property(_get_base_image, None, None, '')
+
+    def set_holder(self, img_holder, frame=0):
+        self.img_holder = img_holder
+        self.time = 0.0
+        self.frame = frame % img_holder.frame_count
+        self.base_frame = self.frame
+        self.image = rotcache.rotate(img_holder.images[self.frame],
+                                     -self.rotation)
+        self.image_rotation = self.rotation
+
     def play(self, frame=0):
         self.playing = True
         self.time = 0.0
-        self.frame = frame % self.frame_count
+        self.frame = frame % self.img_holder.frame_count
 
     def stop(self):
         self.time = 0.0
@@ -56,50 +101,61 @@ class Animation(object):
         self.playing = True
 
     def update(self, time_passed, pos):
+        holder = self.img_holder
         if self.playing:
             self.time += time_passed
-            if self.time >= self.frame_times[self.frame]:
-                self.frame = (self.frame+1) % self.frame_count
+            if self.time >= holder.frame_times[self.frame]*self.time_scale:
+                self.frame = (self.frame+1) % holder.frame_count
                 self.time = 0.0
-                self.base_image = self.images[self.frame]
-            self.image = pygame.transform.rotate(self.base_image,
-                                                 -self.rotation)
-            self.image_w, self.image_h = self.image.get_size()
-        self.world_pos = self.image.get_rect().move(
-            pos.x - self.image_w / 2,
-            pos.y - self.image_h / 2)
-
-    def blit_me(self, screen, camera, flip=False):
-        draw_pos = camera.rect_world_to_screen(self.world_pos)
-        if flip: image = pygame.transform.flip(self.image, True, False)
+                self.base_frame = self.frame
+            base_image = holder.images[self.base_frame]
+            self.image = rotcache.rotate(base_image, -self.rotation)
+            self.image_rotation = self.rotation
+        if self.image_rotation == 0:
+            image_w, image_h = holder.sizes[self.base_frame]
+        else:
+            image_w, image_h = self.image.get_size()
+        self.world_pos = pygame.Rect(pos.x - image_w / 2, pos.y - image_h / 2,
+                                     image_w, image_h)
+
+    def blit_me(self, screen, camera, flip=False, offset=(0, 0)):
+        draw_pos = camera.rect_world_to_screen(self.world_pos, offset)
+        if flip:
+            mirrored = self.img_holder.mirrored()[self.base_frame]
+            image = rotcache.rotate(mirrored, self.image_rotation)
         else: image = self.image
         screen.blit(image, draw_pos)
 
+# name -> ImageHolder tables, shared by every sprite with the same holders #
+anim_tables = dict()
+
+def anim_table(img_holders):
+    key = tuple(img_holders)
+    table = anim_tables.get(key)
+    if table is None:
+        table = dict((holder.name, holder) for holder in img_holders)
+        anim_tables[key] = table
+    return table
+
 class AnimatedSprite(pygame.sprite.Sprite):
     def __init__(self, screen, camera, pos, name, img_holders):
         pygame.sprite.Sprite.__init__(self)
         self.screen = screen
-        self.anims = dict()
-        for img_holder in img_holders:
-            sprite_name = img_holder.name
-            self.anims[sprite_name] = Animation(img_holder)
-        self.curr_anim = img_holders[0].name
+        self.anim_table = anim_table(img_holders)
+        self.anim = Animation(img_holders[0])
         self.pos = vec2d(pos)
+        self.prev_pos = (self.pos.x, self.pos.y)
         self.camera = camera
         self.keep_frame = False
+        self.anim.update(0, self.pos)
 
     def _get_anim(self):
-        return self.anims[self.curr_anim]
+        return self.anim
     def _set_anim(self, name):
-        try:
-            if name == self.curr_anim: return
-        except: pass
-        old_rotation = self.current_anim.rotation
-        old_playing = self.current_anim.playing
-        old_frame = self.current_anim.frame+1 if self.keep_frame else 0
-        self.curr_anim = name
-        self.current_anim.rotation = old_rotation
-        if old_playing: self.current_anim.play(old_frame)
+        anim = self.anim
+        if name == anim.img_holder.name: return
+        frame = anim.frame+1 if self.keep_frame else 0
+        anim.set_holder(self.anim_table[name], frame)
     current_anim = property(_get_anim, _set_anim, None, '')
 
     def _get_rotation(self):
@@ -116,9 +172,30 @@ class AnimatedSprite(pygame.sprite.Sprite):
     def update(self, time_passed):
         self.current_anim.update(time_passed, self.pos)
 
+    def remember_pos(self):
+        self.prev_pos = (self.pos.x, self.pos.y)
+
+    def mark_dirty(self, tracker):
+        camera = self.camera
+        offset = camera.lerp_offset(self.prev_pos, self.pos)
+        tracker.add(camera.rect_world_to_screen(self.current_anim.world_pos,
+                                                offset))
+
+    # world rect the sprite draws into at its last step #
+    def bounds(self):
+        return self.current_anim.world_pos
+
+    # bounds moved to where blit_me draws them this frame, for camera.cull #
+    def draw_bounds(self):
+        rect = self.bounds()
+        dx, dy = self.camera.lerp_offset(self.prev_pos, self.pos)
+        return (rect.x + dx, rect.y + dy, rect.width, rect.height)
+
+    # drawn unconditionally, the owner culls with camera.cull #
     def blit_me(self, flip=False):
-        if self.camera.rect_on_screen(self.current_anim.world_pos):
-            self.current_anim.blit_me(self.screen, self.camera, flip)
+        camera = self.camera
+        offset = camera.lerp_offset(self.prev_pos, self.pos)
+        self.current_anim.blit_me(self.screen, camera, flip, offset)
 
     def play(self):
         self.current_anim.play()
@@ -0,0 +1,68 @@
+import pygame
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+SOUND_TYPES = ('.wav', '.ogg')
+
+# decoded images and sounds by path; images leave it when taken #
+cache = dict()
+
+def decode(path):
+    if path.lower().endswith(SOUND_TYPES): return pygame.mixer.Sound(path)
+    return pygame.image.load(path)
+
+def load(path):
+    try:
+        return path, decode(path), None
+    except Exception as e:
+        return path, None, e
+
+# the caller converts and keeps the surface, so the decode is not held #
+# twice; taking it again decodes from disk                              #
+def image(path):
+    surface = cache.pop(path, None)
+    if surface is None: surface = pygame.image.load(path)
+    return surface
+
+def sound(path):
+    sound = cache.get(path)
+    if sound is None: sound = cache[path] = pygame.mixer.Sound(path)
+    return sound
+
+class AssetLoader(object):
+    ''' Decodes image and sound files on a pool of worker threads
+        results land in the shared cache, so image() and sound() find
+        them already decoded; display-format conversion is left to the
+        main thread, and image() takes the decode back out of the cache
+        '''
+    def __init__(self, workers=None):
+        self.workers = workers or cpu_count()
+        self.total = 0
+        self.finished = 0
+        self.errors = []
+
+    def start(self, paths):
+        paths = [path for path in paths if path not in cache]
+        self.total = len(paths)
+        self.finished = 0
+        self.pool = ThreadPool(self.workers)
+        for path in paths:
+            self.pool.apply_async(load, (path,), callback=self.loaded)
+        self.pool.close()
+
+    # runs on the pool's single result thread, one result at a time #
+    def loaded(self, result):
+        path, value, error = result
+        if error is None: cache[path] = value
+        else: self.errors.append((path, error))
+        self.finished += 1
+
+    def progress(self):
+        if self.total == 0: return 1.0
+        return 1.0 * self.finished / self.total
+
+    def done(self):
+        return self.finished >= self.total
+
+    def join(self):
+        self.pool.join()
@@ -0,0 +1,113 @@
+''' Sprite atlases for ImageHolder animations
+
+    build(folder) packs every animation under images/<folder> (any
+    directory holding a times.txt) into images/<folder>/atlas.png and
+    writes frame rects and frame times to images/<folder>/atlas.json:
+        {"anim": [[time, ...], [[x, y, w, h], ...]], ...}
+    load(folder) returns the atlas surface, converted to display format,
+    and index, or None if the folder has no atlas.
+    '''
+import pygame, os, json
+import assets
+
+FOLDERS = ['megaman', 'samus', 'warthog', 'bullets', 'fire']
+PADDING = 1
+MAX_WIDTH = 1024
+
+def atlas_paths(folder):
+    path = os.path.join('images', folder)
+    return (os.path.join(path, 'atlas.png'),
+            os.path.join(path, 'atlas.json'))
+
+# frames come back in display format unless convert is off, as the #
+# build step runs without a display                                 #
+def read_anim(path, convert=True):
+    with open(os.path.join(path, 'times.txt'), 'r') as times:
+        lines = times.read().split('\n')
+    fc = int(lines[0])
+    frame_times = [float(lines[i]) for i in xrange(1, fc+1)]
+    images = [assets.image(os.path.join(path, '%d.png' % i))
+                        for i in xrange(fc)]
+    if convert: images = [image.convert_alpha() for image in images]
+    return frame_times, images
+
+# files the folder's animations are loaded from: the atlas if built #
+def frame_paths(folder):
+    png_path, index_path = atlas_paths(folder)
+    if os.path.exists(png_path) and os.path.exists(index_path):
+        return [png_path]
+    paths = []
+    for anim in find_anims(folder):
+        path = os.path.join('images', folder, anim)
+        with open(os.path.join(path, 'times.txt'), 'r') as times:
+            fc = int(times.readline())
+        paths.extend(os.path.join(path, '%d.png' % i) for i in xrange(fc))
+    return paths
+
+def find_anims(folder):
+    root = os.path.join('images', folder)
+    anims = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        if 'times.txt' in filenames:
+            anims.append(os.path.relpath(dirpath, root).replace(os.sep, '/'))
+    return sorted(anims)
+
+# shelf packing: tallest frames first, left to right in rows #
+def pack(sizes, max_width=MAX_WIDTH):
+    order = sorted(xrange(len(sizes)), key=lambda i: -sizes[i][1])
+    positions = [None] * len(sizes)
+    x = y = shelf_height = width = 0
+    for i in order:
+        w, h = sizes[i]
+        if x > 0 and x + w > max_width:
+            y += shelf_height + PADDING
+            x = shelf_height = 0
+        positions[i] = (x, y)
+        x += w + PADDING
+        width = max(width, x)
+        shelf_height = max(shelf_height, h)
+    return positions, (max(width, 1), max(y + shelf_height, 1))
+
+def build(folder):
+    frames, index = [], dict()
+    for anim in find_anims(folder):
+        frame_times, images = read_anim(os.path.join('images', folder, anim),
+                                        False)
+        index[anim] = [frame_times, range(len(frames),
+                                          len(frames) + len(images))]
+        frames.extend(images)
+    positions, size = pack([image.get_size() for image in frames])
+    sheet = pygame.Surface(size, pygame.SRCALPHA, 32)
+    sheet.fill((0, 0, 0, 0))
+    for image, pos in zip(frames, positions):
+        sheet.blit(image, pos)
+    for anim, (frame_times, frame_ids) in index.items():
+        rects = [list(positions[i]) + list(frames[i].get_size())
+                 for i in frame_ids]
+        index[anim] = [frame_times, rects]
+    png_path, index_path = atlas_paths(folder)
+    pygame.image.save(sheet, png_path)
+    with open(index_path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'), sort_keys=True)
+    return len(frames), size
+
+loaded = dict()
+
+def load(folder):
+    if folder not in loaded:
+        png_path, index_path = atlas_paths(folder)
+        if os.path.exists(png_path) and os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            loaded[folder] = (assets.image(png_path).convert_alpha(), index)
+        else: loaded[folder] = None
+    return loaded[folder]
+
+def unload():
+    loaded.clear()
+
+if __name__ == "__main__":
+    for folder in FOLDERS:
+        count, size = build(folder)
+        print "%s: %d frames in %dx%d" % (folder, count, size[0], size[1])
@@ -1,54 +1,108 @@
 import pygame, random
-from vec2d import vec2d
-
-class BloodParticle(object):
-    def __init__(self, power, pos, ground_y):
-        self.velocity = vec2d(random.random()*power, 0)
-        self.velocity.angle = random.randint(0, 359)
-        self.pos = pos + self.velocity / 2
-        self.ground_y = ground_y
-        self.radius = random.randint(2, 5)
-        self.color = (random.randint(128, 200), 0, 0)
-
-    def update(self):
-        self.velocity.y += 2
-        self.pos += self.velocity
-        if self.pos.y > self.ground_y:
-            self.pos.y = self.ground_y
-            self.velocity *= 0.8
-        self.world_rect = pygame.Rect(
-            self.pos.x - self.radius, self.pos.y - self.radius,
-            2*self.radius, 2*self.radius)
-
-    def blit_me(self, screen, camera):
-        if camera.rect_on_screen(self.world_rect):
-            draw_pos = camera.world_to_screen(self.pos)
-            draw_pos.x, draw_pos.y = int(draw_pos.x), int(draw_pos.y)
-            rad = int(self.radius)
-            pygame.draw.circle(screen, self.color, draw_pos, rad)
-
-class BloodExplosion(object):
-    def __init__(self, screen, amount, power, pos, ground_y):
+import numpy as np
+
+class BloodSystem(object):
+    ''' Every blood droplet in the game, stored as parallel arrays
+        each update is one vectorized step over all live droplets
+        '''
+    gravity = 2
+    ground_friction = 0.8
+    shrink = 0.96
+    min_radius = 0.5
+    life = 10.0
+
+    def __init__(self, screen, capacity=1024):
         self.screen = screen
-        self.s_w, self.s_h = screen.get_size()
-        self.blood_pieces = [BloodParticle(power, pos, ground_y)
-                                    for _ in xrange(amount)]
-        self.time_left = 5
-
-    def update(self, camera):
-        i = 0
-        count = len(self.blood_pieces)
-        while i < count:
-            part = self.blood_pieces[i]
-            part.update()
-            if abs(part.velocity.x) <= 1:
-                part.radius *= 0.96
-                if part.radius <= 0.5:
-                    self.blood_pieces.pop(i)
-                    count -= 1
-                else: i += 1
-            else: i += 1
+        self.rng = np.random.RandomState(random.getrandbits(32))
+        self.count = 0
+        # droplets ever made, unlike count this does not lag when offloaded #
+        self.spawned = 0
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.radius = np.zeros(capacity)
+        self.color = np.zeros(capacity, dtype=np.int32)
+        self.life_left = np.zeros(capacity)
+        self.ground_y = np.zeros(capacity)
+
+    def __len__(self):
+        return self.count
+
+    def grow(self, needed):
+        capacity = len(self.radius)
+        while capacity < needed: capacity *= 2
+        for name in ('pos', 'velocity', 'radius', 'color', 'life_left',
+                     'ground_y'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def explode(self, amount, power, pos, ground_y):
+        start, end = self.count, self.count + amount
+        if end > len(self.radius): self.grow(end)
+        rng = self.rng
+        speed = rng.random_sample(amount) * power
+        angle = np.radians(rng.randint(0, 360, amount))
+        velocity = self.velocity[start:end]
+        velocity[:, 0] = speed * np.cos(angle)
+        velocity[:, 1] = speed * np.sin(angle)
+        self.pos[start:end] = (pos[0], pos[1])
+        self.pos[start:end] += velocity / 2
+        self.radius[start:end] = rng.randint(2, 6, amount)
+        self.color[start:end] = rng.randint(128, 201, amount)
+        self.life_left[start:end] = self.life
+        self.ground_y[start:end] = ground_y
+        self.count = end
+        self.spawned += amount
+
+    def update(self, time_passed):
+        n = self.count
+        if n == 0: return
+        pos, velocity = self.pos[:n], self.velocity[:n]
+        radius = self.radius[:n]
+        velocity[:, 1] += self.gravity
+        pos += velocity
+        ground_y = self.ground_y[:n]
+        grounded = pos[:, 1] > ground_y
+        pos[grounded, 1] = ground_y[grounded]
+        velocity[grounded] *= self.ground_friction
+        slow = np.abs(velocity[:, 0]) <= 1
+        radius[slow] *= self.shrink
+        self.life_left[:n] -= time_passed
+        alive = (radius > self.min_radius) & (self.life_left[:n] > 0)
+        if not alive.all(): self.compact(alive)
+
+    def compact(self, alive):
+        n = self.count
+        keep = np.flatnonzero(alive)
+        count = len(keep)
+        for arr in (self.pos, self.velocity, self.radius, self.color,
+                    self.life_left, self.ground_y):
+            arr[:count] = arr[keep]
+        self.count = count
+
+    def mark_dirty(self, tracker, camera):
+        n = self.count
+        if n == 0: return
+        pos, radius = self.pos[:n], self.radius[:n]
+        left = (pos[:, 0] - radius).min() - camera.draw_pos.x
+        top = (pos[:, 1] - radius).min() - camera.draw_pos.y
+        right = (pos[:, 0] + radius).max() - camera.draw_pos.x
+        bottom = (pos[:, 1] + radius).max() - camera.draw_pos.y
+        tracker.add_bounds(int(left), int(top), int(right) + 1,
+                           int(bottom) + 1)
 
     def blit_me(self, camera):
-        for part in self.blood_pieces:
-            part.blit_me(self.screen, camera)
\ No newline at end of file
+        n = self.count
+        if n == 0: return
+        pos, radius = self.pos[:n], self.radius[:n, None]
+        rects = np.hstack((pos - radius, radius*2, radius*2))
+        index = np.flatnonzero(camera.rects_on_screen(rects))
+        if len(index) == 0: return
+        points = camera.world_to_screen_array(pos[index]).astype(np.int32)
+        xs, ys = points[:, 0].tolist(), points[:, 1].tolist()
+        rads = self.radius[index].astype(np.int32).tolist()
+        reds = self.color[index].tolist()
+        screen, circle = self.screen, pygame.draw.circle
+        for x, y, rad, red in zip(xs, ys, rads, reds):
+            circle(screen, (red, 0, 0), (x, y), rad)
@@ -0,0 +1,59 @@
+from bisect import bisect_left, bisect_right
+
+def _x(item): return item.pos.x
+
+class AxisIndex(object):
+    ''' Entities kept sorted by world x
+        the world is one lane along x, so a range on x throws out
+        almost everything before any real distance test is done
+        '''
+    def __init__(self, items=()):
+        self.items = list(items)
+        self.xs = []
+        self.update()
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        x = item.pos.x
+        i = bisect_right(self.xs, x)
+        self.items.insert(i, item)
+        self.xs.insert(i, x)
+
+    def remove(self, item):
+        items, xs = self.items, self.xs
+        i = bisect_left(xs, item.pos.x)
+        if i >= len(items) or items[i] is not item:
+            i = items.index(item)
+        items.pop(i)
+        xs.pop(i)
+
+    # re-sort after movement, the previous order is almost right so  #
+    # the sort is close to linear                                     #
+    def update(self):
+        self.items.sort(key=_x)
+        self.xs = [item.pos.x for item in self.items]
+
+    def query(self, x, radius):
+        lo = bisect_left(self.xs, x - radius)
+        hi = bisect_right(self.xs, x + radius, lo)
+        return self.items[lo:hi]
+
+    # items with x before left or from right on #
+    def outside(self, left, right):
+        xs = self.xs
+        return (self.items[:bisect_left(xs, left)] +
+                self.items[bisect_left(xs, right):])
+
+    # (item, squared distance) for each item within radius of pos #
+    def near(self, pos, radius):
+        px, py = pos[0], pos[1]
+        radius_sqrd = radius * radius
+        found = []
+        for item in self.query(px, radius):
+            dx = item.pos.x - px
+            dy = item.pos.y - py
+            dist_sqrd = dx*dx + dy*dy
+            if dist_sqrd < radius_sqrd: found.append((item, dist_sqrd))
+        return found
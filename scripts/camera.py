@@ -1,10 +1,14 @@
 import pygame
+import numpy as np
 from vec2d import vec2d
 
 class Camera(object):
     def __init__(self, x, y, screen_width, screen_height):
         self.pos = vec2d(x, y)
         self.width, self.height = screen_width, screen_height
+        self.prev_pos = (x, y)
+        self.draw_pos = vec2d(x, y)
+        self.alpha = 1.0
 
     def _get_left(self): return self.pos.x
     def _set_left(self, value): self.pos.x = value
@@ -35,18 +39,57 @@ class Camera(object):
         return (self.left <= pos.x <= self.right and
                 self.top <= pos.y <= self.bottom)
 
+    # rect overlaps the drawn view, checked as two interval overlaps so #
+    # rects larger than the screen count too                           #
     def rect_on_screen(self, rectangle):
-        right = rectangle.left + rectangle.width
-        bottom = rectangle.top + rectangle.height
-        return (self.pt_on_screen((rectangle.left, rectangle.top)) or
-                self.pt_on_screen((rectangle.left, bottom)) or 
-                self.pt_on_screen((right, rectangle.top)) or
-                self.pt_on_screen((right, bottom)))
+        x, y = self.draw_pos.x, self.draw_pos.y
+        return (rectangle.right > x and rectangle.left < x + self.width and
+                rectangle.bottom > y and rectangle.top < y + self.height)
 
+    # rect_on_screen for many rects at once: a sequence of rects or an #
+    # N x 4 array of (x, y, w, h) rows in, an N bool mask out           #
+    def rects_on_screen(self, rects):
+        if not isinstance(rects, np.ndarray):
+            rects = [tuple(rect) for rect in rects]
+        rects = np.asarray(rects, dtype=float).reshape(-1, 4)
+        x, y = self.draw_pos.x, self.draw_pos.y
+        left, top = rects[:, 0], rects[:, 1]
+        return ((left + rects[:, 2] > x) & (left < x + self.width) &
+                (top + rects[:, 3] > y) & (top < y + self.height))
 
-    def world_to_screen(self, world_pos): return world_pos - self.pos
+    # the items whose rects are on screen, in order #
+    def cull(self, items, rects):
+        if not items: return []
+        mask = self.rects_on_screen(rects)
+        return [item for item, shown in zip(items, mask.tolist()) if shown]
 
-    def screen_to_world(self, screen_pos): return screen_pos + self.pos
+    def world_to_screen(self, world_pos): return world_pos - self.draw_pos
 
-    def rect_world_to_screen(self, world_rect):
-        return world_rect.move(-self.pos.x, -self.pos.y)
\ No newline at end of file
+    # world_to_screen for an N x 2 array of positions #
+    def world_to_screen_array(self, world_pos):
+        return np.asarray(world_pos, dtype=float) - (self.draw_pos.x,
+                                                     self.draw_pos.y)
+
+    def screen_to_world(self, screen_pos): return screen_pos + self.draw_pos
+
+    def rect_world_to_screen(self, world_rect, offset=(0, 0)):
+        return world_rect.move(offset[0] - self.draw_pos.x,
+                               offset[1] - self.draw_pos.y)
+
+    # interpolation between the last two simulation steps #
+    def remember_pos(self):
+        self.prev_pos = (self.pos.x, self.pos.y)
+
+    def interpolate(self, alpha):
+        self.alpha = alpha
+        px, py = self.prev_pos
+        self.draw_pos = vec2d(px + (self.pos.x - px)*alpha,
+                              py + (self.pos.y - py)*alpha)
+
+    # world offset that moves something drawn at pos back to where it #
+    # was alpha of the way through the last step, teleports snap       #
+    def lerp_offset(self, prev_pos, pos):
+        back = 1.0 - self.alpha
+        dx, dy = (prev_pos[0] - pos.x)*back, (prev_pos[1] - pos.y)*back
+        if abs(dx) > self.width or abs(dy) > self.height: return (0, 0)
+        return (dx, dy)
\ No newline at end of file
@@ -0,0 +1,80 @@
+import pygame
+
+class DirtyTracker(object):
+    ''' Screen regions that changed since the last frame
+        drawables add the screen rects they cover this frame, and the
+        regions to repaint are those plus the rects from last frame,
+        merged into at most max_regions rects. None means repaint the
+        whole screen: the view moved, a full repaint was asked for, or
+        the dirty area is too large to be worth clipping
+        '''
+    def __init__(self, screen_rect, max_regions=4, full_ratio=0.5):
+        self.screen_rect = pygame.Rect(screen_rect)
+        self.max_regions = max_regions
+        self.full_ratio = full_ratio
+        self.prev_rects = []
+        self.rects = []
+        self.view = None
+        self.force_full = True
+        self.full_frames = 0
+        self.partial_frames = 0
+
+    def invalidate(self):
+        self.force_full = True
+
+    def begin(self, view):
+        self.full = self.force_full or view != self.view
+        self.force_full = False
+        self.view = view
+        self.prev_rects = self.rects
+        self.rects = []
+
+    def add(self, rect):
+        rect = self.screen_rect.clip(rect)
+        if rect.width and rect.height: self.rects.append(rect)
+
+    def add_bounds(self, left, top, right, bottom):
+        self.add(pygame.Rect(left, top, right - left + 1, bottom - top + 1))
+
+    def regions(self):
+        if self.full:
+            self.full_frames += 1
+            return None
+        regions = merge_rects(self.prev_rects + self.rects, self.max_regions)
+        area = sum(r.width * r.height for r in regions)
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        if area > self.full_ratio * screen_area:
+            self.full_frames += 1
+            return None
+        self.partial_frames += 1
+        return regions
+
+def merge_rects(rects, max_regions):
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    if len(merged) > max_regions:
+        merged = merge_closest(merged, max_regions)
+    return merged
+
+# joins the neighbours in x order whose union adds the least area until #
+# max_regions are left; joined rects may overlap others, which is fine  #
+# for clipping                                                          #
+def merge_closest(rects, max_regions):
+    rects = sorted(rects, key=lambda rect: rect.left)
+    while len(rects) > max_regions:
+        best, best_growth = 0, None
+        for i in xrange(len(rects) - 1):
+            a, b = rects[i], rects[i + 1]
+            union = a.union(b)
+            growth = (union.width * union.height - a.width * a.height -
+                      b.width * b.height)
+            if best_growth is None or growth < best_growth:
+                best, best_growth = i, growth
+        rects[best:best + 2] = [rects[best].union(rects[best + 1])]
+    return rects
@@ -1,24 +1,46 @@
 import pygame, random, math
+import numpy as np
 from animatedSprite import AnimatedSprite, ImageHolder
-from blood import BloodExplosion
 from vec2d import vec2d
 from camera import Camera
 from fire import Fire
 
 def init():
     pygame.init()
+    Enemy.rng = np.random.RandomState(random.getrandbits(32))
     Megaman.init()
     Samus.init()
     Warthog.init()
     Bullet.init()
+    Fire.init()
+
+# the worm as the decision passes see it #
+def worm_state(worm):
+    return (worm.pos.x, worm.pos.y, worm.in_ground())
 
 class Enemy(AnimatedSprite):
+    mirror = False
+    # far off screen, types with lod tick now and then through update_far #
+    lod = False
+    lod_step = None
+    needs_bullets = False
+    # starting with direction, see dormant_state #
+    dormant_attrs = ("direction", "moving", "speed")
+
     @classmethod
     def init(cls, folder, *anims):
         cls.anims = []
         for anim in anims:
             cls.anims.append(
-                ImageHolder.load_anim(folder, anim))
+                ImageHolder.load_anim(folder, anim, cls.mirror))
+
+    # construct any enemy type, bullets is only passed to the types #
+    # that shoot                                                     #
+    @classmethod
+    def create(cls, screen, camera, pos, direction, bullets):
+        if cls.needs_bullets:
+            return cls(screen, camera, pos, direction, bullets)
+        return cls(screen, camera, pos, direction)
 
     @classmethod
     def on_screen(cls, screen, camera, screen_width, ground_pos):
@@ -38,25 +60,131 @@ class Enemy(AnimatedSprite):
         self.move_by_speed = False
         self.death_radius = 0
 
-    def update(self, time_passed, worm, special=False):
+    # attributes read into columns beside x, y, dead, right and moving #
+    column_attrs = ()
+
+    # what this type's decision pass reads of a list of enemies, as #
+    # numpy columns so the pass can run in a worker process          #
+    @classmethod
+    def columns(cls, enemies):
+        state = dict()
+        state["x"] = np.array([enemy.pos.x for enemy in enemies], dtype=float)
+        state["y"] = np.array([enemy.pos.y for enemy in enemies], dtype=float)
+        state["dead"] = np.array([enemy.dead for enemy in enemies], dtype=bool)
+        state["right"] = np.array([enemy.direction == "r"
+                                   for enemy in enemies], dtype=bool)
+        state["moving"] = np.array([enemy.moving for enemy in enemies],
+                                   dtype=bool)
+        for name in cls.column_attrs:
+            state[name] = np.array([getattr(enemy, name)
+                                    for enemy in enemies])
+        return state
+
+    # columns of a decision, see decide #
+    decision_fields = ("right", "moving")
+
+    # decide from columns state and worm_state what each enemy does #
+    # this step, drawing from rng only; the columns it returns are   #
+    # named in decision_fields                                        #
+    @classmethod
+    def decide(cls, state, worm, rng):
+        return cls.wander(state, ~state["dead"], rng)
+
+    # rows of a decision apply has to act on #
+    @classmethod
+    def rows(cls, state, decision):
+        return cls.changed(state, decision)
+
+    # carry out rows index of a decision on enemies #
+    @classmethod
+    def apply(cls, enemies, decision, index, time_passed, worm):
+        cls.apply_wander(enemies, decision, index)
+
+    # update a list of enemies of this type: one decision pass over #
+    # all of them, then each moves and animates                     #
+    @classmethod
+    def update_all(cls, enemies, time_passed, worm):
+        if not enemies: return
+        state = cls.columns(enemies)
+        decision = cls.decide(state, worm_state(worm), Enemy.rng)
+        cls.apply(enemies, decision, cls.rows(state, decision), time_passed,
+                  worm)
+        for enemy in enemies:
+            enemy.act(time_passed, worm)
+
+    # coarse update for enemies far off screen: they only wander and #
+    # move, by all the steps skipped since their last update         #
+    @classmethod
+    def update_far(cls, enemies, steps, worm):
+        if not enemies: return
+        state = cls.columns(enemies)
+        decision = cls.decide_far(state, steps, Enemy.rng)
+        cls.apply_wander(enemies, decision, cls.changed(state, decision))
+        for enemy, count in zip(enemies, steps):
+            enemy.move(count)
+
+    @classmethod
+    def decide_far(cls, state, steps, rng):
+        return cls.wander(state, np.ones(len(steps), dtype=bool), rng,
+                          np.array(steps))
+
+    # random direction and movement changes for the enemies where  #
+    # wandering is set, two rolls per enemy; steps rolls for        #
+    # several steps at once                                         #
+    @classmethod
+    def wander(cls, state, wandering, rng, steps=1):
+        rolls = rng.random_sample((2, len(wandering)))
+        turn = wandering & (rolls[0] < 1 - 0.999**steps)
+        move = wandering & (rolls[1] < 1 - 0.995**steps)
+        return {"right": state["right"] ^ turn,
+                "moving": state["moving"] ^ move}
+
+    # rows where a wander decision differs from the state it came from #
+    @classmethod
+    def changed(cls, state, decision):
+        return np.flatnonzero((decision["right"] != state["right"]) |
+                              (decision["moving"] != state["moving"])).tolist()
+
+    @classmethod
+    def apply_wander(cls, enemies, decision, index):
+        right, moving = decision["right"], decision["moving"]
+        for i in index:
+            enemy = enemies[i]
+            enemy.direction = "r" if right[i] else "l"
+            enemy.moving = bool(moving[i])
+
+    def update(self, time_passed, worm):
+        self.update_all([self], time_passed, worm)
+
+    # move and animate on the decisions already made #
+    def act(self, time_passed, worm):
         if not self.dead:
-            if not special:
-                if random.random() < 0.001:
-                    self.change_direction()
-                if random.random() < 0.005:
-                    self.toggle_movement()
             self.update_anim()
-            if self.move_by_speed:
-                self.pos.x += self.speed
-            elif self.moving:
-                self.pos.x += self.speed * (
-                    (self.direction == "r") - (self.direction == "l"))
-            if self.pos.x < worm.pos.x - 2*self.camera.width:
-                self.pos.x += 4*self.camera.width
-            elif self.pos.x > worm.pos.x + 2*self.camera.width:
-                self.pos.x -= 4*self.camera.width
+            self.move()
         super(Enemy, self).update(time_passed)
 
+    def move(self, steps=1):
+        if self.move_by_speed:
+            self.pos.x += self.speed * steps
+        elif self.moving:
+            self.pos.x += self.speed * steps * (
+                (self.direction == "r") - (self.direction == "l"))
+
+    # (x, y, *dormant_attrs), all an enemy keeps while its chunk sleeps #
+    def dormant_state(self):
+        return ((self.pos.x, self.pos.y) +
+                tuple(getattr(self, name) for name in self.dormant_attrs))
+
+    @classmethod
+    def from_dormant(cls, screen, camera, bullets, state):
+        x, y, direction = state[:3]
+        enemy = cls.create(screen, camera, (x, y), direction, bullets)
+        for name, value in zip(cls.dormant_attrs, state[2:]):
+            setattr(enemy, name, value)
+        enemy.update_anim()
+        AnimatedSprite.update(enemy, 0)
+        return enemy
+
     def change_direction(self):
         self.direction = "r" if self.direction == "l" else "l"
 
@@ -73,6 +201,8 @@ class Enemy(AnimatedSprite):
         sound_man.play_sound_by_type("scream")
 
 class OrganicEnemy(Enemy):
+    lod = True
+
     def __init__(self, screen, camera, pos, name, blood_amt, blood_pwr,
                         anims):
         super(OrganicEnemy, self).__init__(
@@ -80,9 +210,8 @@ class OrganicEnemy(Enemy):
         self.blood_amt = blood_amt
         self.blood_pwr = blood_pwr
 
-    def new_blood(self, gp):
-        return BloodExplosion(self.screen, self.blood_amt,
-                              self.blood_pwr, self.pos, gp)
+    def new_blood(self, blood, gp):
+        blood.explode(self.blood_amt, self.blood_pwr, self.pos, gp)
 
     def die(self, worm_vel): self.gone = True
 
@@ -105,18 +234,19 @@ class Megaman(OrganicEnemy):
         self.blood_pwr = 30
         self.play()
 
-    def update(self, time_passed, worm):
-        pos_sep = worm.pos - self.pos
-        dist = pos_sep.length
-        special = False
-        min_dist = 70 if worm.in_ground() else 130
-        if dist < min_dist:
-            special = True
-            if pos_sep.x < 0: self.direction = "r"
-            else: self.direction = "l"
-            if not self.moving: self.toggle_movement()
-        super(Megaman, self).update(time_passed, worm, special)
-        return dist
+    # flee when the worm is close, otherwise wander #
+    @classmethod
+    def decide(cls, state, worm, rng):
+        worm_x, worm_y, in_ground = worm
+        sep_x, sep_y = worm_x - state["x"], worm_y - state["y"]
+        dead = state["dead"]
+        min_dist = 70 if in_ground else 130
+        special = (~dead & (np.abs(sep_x) < min_dist) &
+                   (sep_x*sep_x + sep_y*sep_y < min_dist*min_dist))
+        decision = cls.wander(state, ~special & ~dead, rng)
+        decision["right"] = np.where(special, sep_x < 0, decision["right"])
+        decision["moving"] |= special
+        return decision
 
     def toggle_movement(self):
         super(Megaman, self).toggle_movement()
@@ -125,20 +255,63 @@ class Megaman(OrganicEnemy):
         self.state = "run" if self.moving else "idle"
         super(Megaman, self).update_anim()
 
+class BulletPool(object):
+    ''' Recycles Bullet instances
+        acquire takes the same arguments as Bullet and resets a free
+        bullet in place, release hands a dead bullet back
+        '''
+    def __init__(self):
+        self.free = []
+        self.in_use = 0
+        self.high_water = 0
+        self.created = 0
+
+    def acquire(self, screen, camera, pos, speed, direction, size, **kwargs):
+        if self.free:
+            bullet = self.free.pop()
+            bullet.reset(screen, camera, pos, speed, direction, size, **kwargs)
+        else:
+            bullet = Bullet(screen, camera, pos, speed, direction, size,
+                            **kwargs)
+            self.created += 1
+        self.in_use += 1
+        self.high_water = max(self.high_water, self.in_use)
+        return bullet
+
+    def release(self, bullet):
+        self.in_use -= 1
+        self.free.append(bullet)
+
+    def stats(self):
+        return {"in_use": self.in_use, "free": len(self.free),
+                "high_water": self.high_water, "created": self.created}
+
 class Bullet(AnimatedSprite):
     @classmethod
     def init(cls):
         cls.bullet_types = dict()
         for enemy in ['samus', 'warthog']:
             try:
-                cls.bullet_types[enemy] = ImageHolder.load_anim('bullets', enemy)
+                cls.bullet_types[enemy] = ImageHolder.load_anim(
+                    'bullets', enemy, True)
             except: pass
+        cls.pool = BulletPool()
 
     def __init__(self, screen, camera, pos, speed, direction, size,
                         color=(255,255,255), outline=(0,0,0),
                         max_time=10, bullet_type=None, flippable=False):
         super(Bullet, self).__init__(screen, camera, pos, 'bullet',
                                      Bullet.bullet_types.values())
+        self.reset(screen, camera, pos, speed, direction, size, color,
+                   outline, max_time, bullet_type, flippable)
+
+    def reset(self, screen, camera, pos, speed, direction, size,
+                        color=(255,255,255), outline=(0,0,0),
+                        max_time=10, bullet_type=None, flippable=False):
+        self.screen = screen
+        self.camera = camera
+        self.pos.x, self.pos.y = pos[0], pos[1]
+        self.remember_pos()
         self.size = size
         self.color = color
         self.outline = outline
@@ -146,10 +319,17 @@ class Bullet(AnimatedSprite):
         self.time_passed = 0.0
         self.max_time = max_time
         self.flip = random.choice([flippable, False])
+        # everything a recycled bullet shows is set again, so it matches #
+        # a freshly constructed one                                      #
         if bullet_type != None:
             self.rotation = vec2d(direction).angle
-            self.current_anim = bullet_type
+            self.current_anim.set_holder(self.anim_table[bullet_type])
             self.play()
+        else:
+            self.rotation = 0
+            self.current_anim.set_holder(Bullet.bullet_types.values()[0])
+            self.current_anim.stop()
+        self.current_anim.update(0, self.pos)
 
     def update(self, time_passed, ground_pos):
         if self.current_anim != None:
@@ -161,15 +341,14 @@ class Bullet(AnimatedSprite):
         return True
 
     def blit_me(self):
-        if self.camera.pt_on_screen(self.pos):
-            if self.current_anim == None:
-                draw_pos = camera.world_to_screen(self.pos)
-                draw_pos.x, draw_pos.y = int(draw_pos.x), int(draw_pos.y)
-                rad = self.size / 2
-                pygame.draw.circle(screen, self.color, draw_pos, rad)
-                pygame.draw.circle(screen, self.outline, draw_pos, rad, 1)
-            else:
-                super(Bullet, self).blit_me(self.flip)
+        if self.current_anim == None:
+            draw_pos = self.camera.world_to_screen(self.pos)
+            draw_pos.x, draw_pos.y = int(draw_pos.x), int(draw_pos.y)
+            rad = self.size / 2
+            pygame.draw.circle(self.screen, self.color, draw_pos, rad)
+            pygame.draw.circle(self.screen, self.outline, draw_pos, rad, 1)
+        else:
+            super(Bullet, self).blit_me(self.flip)
 
 class Samus(OrganicEnemy):
     @classmethod
@@ -189,6 +368,9 @@ class Samus(OrganicEnemy):
         return cls(screen, camera, (x, y), random.choice(["l", "r"]), bullets)
 
     y_sep = 20
+    needs_bullets = True
+    dormant_attrs = Enemy.dormant_attrs + ("shoot_sep", "min_dist",
+                                           "max_dist")
 
     def __init__(self, screen, camera, pos, direction, bullet_list):
         super(Samus, self).__init__(screen, camera, pos, "samus", 40, 30,
@@ -207,40 +389,65 @@ class Samus(OrganicEnemy):
         self.bullets = bullet_list
         self.play()
 
-    def update(self, time_passed, worm):
-        pos_sep = worm.pos - self.pos
-        dist = pos_sep.length
-        self.shooting = False
-        special = False
-        if 50 < dist < 600 and not worm.in_ground():
-            special = True
-            self.direction = "r" if pos_sep.x >= 0 else "l"
-            if dist < self.min_dist:
-                self.direction = "l" if pos_sep.x >= 0 else "r"
-                self.moving = True
-                self.shoot_time = 0
-            else:
-                self.moving = False if dist < self.max_dist else True
-                angle = -pos_sep.angle
-                if angle >= 0:
-                    self.shooting = True
-                    if 0 <= angle < 22.5: self.shoot_angle = "r"
-                    elif 22.5 <= angle < 157.5:
-                        if self.moving:
-                            if 22.5 <= angle < 90: self.shoot_angle = "ur"
-                            else: self.shoot_angle = "ul"
-                        else:
-                            if 22.5 <= angle < 67.5: self.shoot_angle = "ur"
-                            elif 67.5 <= angle < 112.5: self.shoot_angle = "u"
-                            else: self.shoot_angle = "ul"
-                    else: self.shoot_angle = "l"
-                self.shoot_time += time_passed
-                if self.shoot_time > self.shoot_sep:
-                    self.shoot_time = 0
-                    self.shoot(worm)
-        else: self.shoot_time = 0
-        super(Samus, self).update(time_passed, worm, special)
-        return dist
+    shoot_angles = ["r", "ur", "u", "ul", "l"]
+
+    # what update_all does with each Samus, see decide #
+    WANDER, FLEE, ENGAGE = 0, 1, 2
+    decision_fields = Enemy.decision_fields + ("mode", "shooting", "bucket")
+    column_attrs = ("min_dist", "max_dist")
+
+    # keep between min_dist and max_dist of the worm and shoot at it #
+    # while it is above ground, otherwise wander                     #
+    @classmethod
+    def decide(cls, state, worm, rng):
+        worm_x, worm_y, in_ground = worm
+        sep_x, sep_y = worm_x - state["x"], worm_y - state["y"]
+        dist = np.sqrt(sep_x*sep_x + sep_y*sep_y)
+        if in_ground: dist[:] = 0
+        else: dist[np.abs(sep_x) >= 600] = 0
+        dead = state["dead"]
+        special = ~dead & (dist > 50) & (dist < 600)
+        close = special & (dist < state["min_dist"])
+        moving = dist >= state["max_dist"]
+        angle = -np.degrees(np.arctan2(sep_y, sep_x))
+        decision = cls.wander(state, ~special & ~dead, rng)
+        decision["right"] = np.where(special, (sep_x >= 0) ^ close,
+                                     decision["right"])
+        decision["moving"] = np.where(special, moving | close,
+                                      decision["moving"])
+        decision["mode"] = np.where(close, cls.FLEE,
+                                    np.where(special, cls.ENGAGE, cls.WANDER))
+        decision["shooting"] = special & ~close & (angle >= 0)
+        decision["bucket"] = np.where(angle < 22.5, 0,
+            np.where(angle >= 157.5, 4,
+            np.where(moving, np.where(angle < 90, 1, 3),
+            np.where(angle < 67.5, 1, np.where(angle < 112.5, 2, 3)))))
+        return decision
+
+    @classmethod
+    def rows(cls, state, decision):
+        return range(len(state["x"]))
+
+    @classmethod
+    def apply(cls, enemies, decision, index, time_passed, worm):
+        right, moving = decision["right"], decision["moving"]
+        mode, shooting = decision["mode"], decision["shooting"]
+        bucket = decision["bucket"]
+        for i in index:
+            enemy = enemies[i]
+            enemy.shooting = False
+            enemy.direction = "r" if right[i] else "l"
+            enemy.moving = bool(moving[i])
+            if mode[i] != cls.ENGAGE:
+                enemy.shoot_time = 0
+                continue
+            if shooting[i]:
+                enemy.shooting = True
+                enemy.shoot_angle = cls.shoot_angles[bucket[i]]
+            enemy.shoot_time += time_passed
+            if enemy.shoot_time > enemy.shoot_sep:
+                enemy.shoot_time = 0
+                enemy.shoot(worm)
 
     def shoot(self, worm):
         s_ang = self.shoot_angle
@@ -253,7 +460,8 @@ class Samus(OrganicEnemy):
         elif s_ang == "n": assert(False)
         bullet_pos = self.pos + bullet_dif
         bullet_dir = worm.pos - bullet_pos
-        self.bullets.append(Bullet(self.screen, self.camera, bullet_pos, 8, bullet_dir, 7,
+        self.bullets.add(Bullet.pool.acquire(
+            self.screen, self.camera, bullet_pos, 8, bullet_dir, 7,
             color=(255,128,0), bullet_type='samus', flippable=True))
 #def __init__(self, screen, camera, pos, speed, direction, size,
  #                       color=(255,255,255), outline=(0,0,0),
@@ -267,8 +475,10 @@ class Samus(OrganicEnemy):
 class Wheels(object):
     @classmethod
     def init(cls):
-        cls.front_wheel = [ImageHolder.load_anim(cls.folder, "wheels/front")]
-        cls.back_wheel = [ImageHolder.load_anim(cls.folder, "wheels/back")]
+        cls.front_wheel = [ImageHolder.load_anim(cls.folder, "wheels/front",
+                                                 True)]
+        cls.back_wheel = [ImageHolder.load_anim(cls.folder, "wheels/back",
+                                                True)]
 
     def __init__(self, screen, camera, vehicle, pos_front, pos_back):
         self.vehicle = vehicle
@@ -280,8 +490,6 @@ class Wheels(object):
             self.__class__.back_wheel)
         self.front.play()
         self.back.play()
-        self.front_times = [1*time for time in self.front.current_anim.frame_times]
-        self.back_times = [1*time for time in self.back.current_anim.frame_times]
         self.time_mult = 1.0
 
     def update(self, time_passed):
@@ -291,11 +499,22 @@ class Wheels(object):
             front_sep, back_sep = self.front_sep*(-1, 1), self.back_sep*(-1, 1)
         self.front.pos = self.vehicle.pos + front_sep
         self.back.pos = self.vehicle.pos + back_sep
-        self.front.current_anim.frame_times = [self.time_mult*t for t in self.front_times]
-        self.back.current_anim.frame_times = [self.time_mult*t for t in self.back_times]
+        self.front.current_anim.time_scale = self.time_mult
+        self.back.current_anim.time_scale = self.time_mult
         self.front.update(time_passed)
         self.back.update(time_passed)
 
+    def remember_pos(self):
+        self.front.remember_pos()
+        self.back.remember_pos()
+
+    def mark_dirty(self, tracker):
+        self.front.mark_dirty(tracker)
+        self.back.mark_dirty(tracker)
+
+    def bounds(self):
+        return self.front.bounds().union(self.back.bounds())
+
     def blit_me(self):
         flip = self.vehicle.direction == "l"
         self.front.blit_me(flip)
@@ -318,7 +537,15 @@ class WarthogWheels(Wheels):
 
 class Warthog(Enemy):
     y_sep = 44
+    mirror = True
     want_directions = ["r", "l", "i"]
+    # turret offset from the centre when facing right #
+    turret_sep = vec2d(-32, -25)
+    needs_bullets = True
+    dormant_attrs = ("direction", "speed", "max_speed", "want_direction",
+                     "shoot_time")
+    # makes the fire of a wrecked warthog, swapped when fire is offloaded #
+    fire_type = Fire
 
     @classmethod
     def on_screen(cls, screen, camera, screen_width, ground_pos, bullets):
@@ -347,18 +574,75 @@ class Warthog(Enemy):
         self.move_by_speed = True
         self.speed = 0
         self.want_direction = random.choice(Warthog.want_directions)
-        self.turret_sep = vec2d(-32, -25)
         self.shoot_dir = "front"
         self.angle = "straight"
+        self.aiming = False
         self.death_radius = 10
         self.shot_timer = 0.0
         self.shoot_time = random.random()*0.5+0.25
 
-    def alive_update(self, time_passed, worm):
-        super(Warthog, self).update(time_passed, worm, True)
-        chance = 0.05 if self.want_direction == "i" else 0.02
-        if random.random() < chance:
-            self.want_direction = random.choice(Warthog.want_directions)
+    decision_fields = ("want", "aiming", "angle", "front")
+    want_codes = dict((want, i) for i, want in enumerate(want_directions))
+    # turret angles by aim bucket, a bucket starts at each edge #
+    aim_angles = ["d2", "d1", "straight", "u1", "u2", "u3"]
+    aim_edges = [-15, -5, 7.5, 20.5, 28]
+
+    @classmethod
+    def columns(cls, enemies):
+        state = super(Warthog, cls).columns(enemies)
+        codes = cls.want_codes
+        state["want"] = np.array([codes[enemy.want_direction]
+                                  for enemy in enemies], dtype=int)
+        return state
+
+    # now and then pick a new direction to drive in, and aim the turret #
+    # at the worm while it is above ground and in range                 #
+    @classmethod
+    def decide(cls, state, worm, rng):
+        worm_x, worm_y, in_ground = worm
+        want = state["want"]
+        rolls = rng.random_sample((2, len(want)))
+        chance = np.where(want == cls.want_codes["i"], 0.05, 0.02)
+        picked = (rolls[1] * len(cls.want_directions)).astype(int)
+        want = np.where(rolls[0] < chance, picked, want)
+        right = state["right"]
+        turret_x = state["x"] + np.where(right, cls.turret_sep[0],
+                                         -cls.turret_sep[0])
+        turret_y = state["y"] + cls.turret_sep[1]
+        sep_x, sep_y = worm_x - turret_x, worm_y - turret_y
+        aiming = sep_x*sep_x + sep_y*sep_y <= 800*800
+        if in_ground: aiming[:] = False
+        angle = -np.degrees(np.arctan2(sep_y, sep_x))
+        angle = np.where(angle < -90, angle + 360, angle)
+        dir_angle = -np.abs(angle - 90) + 90
+        bucket = np.searchsorted(cls.aim_edges, dir_angle, side='right')
+        straight = cls.aim_angles.index("straight")
+        return {"want": want, "aiming": aiming,
+                "angle": np.where(aiming, bucket, straight),
+                "front": (sep_x > 0) == right}
+
+    @classmethod
+    def rows(cls, state, decision):
+        return np.flatnonzero(~state["dead"]).tolist()
+
+    @classmethod
+    def apply(cls, enemies, decision, index, time_passed, worm):
+        want, aiming = decision["want"], decision["aiming"]
+        angle, front = decision["angle"], decision["front"]
+        for i in index:
+            enemy = enemies[i]
+            enemy.want_direction = cls.want_directions[want[i]]
+            enemy.aiming = bool(aiming[i])
+            enemy.angle = cls.aim_angles[angle[i]]
+            if aiming[i]: enemy.shoot_dir = "front" if front[i] else "back"
+
+    # drive towards want_direction and shoot while aiming, or fall #
+    # apart once dead                                              #
+    def act(self, time_passed, worm):
+        if self.dead:
+            self.dead_update(time_passed)
+            return
+        super(Warthog, self).act(time_passed, worm)
         if self.want_direction == "r":
             self.speed += 0.25 if self.speed >= 0 else 0.5
         elif self.want_direction == "l":
@@ -374,48 +658,30 @@ class Warthog(Enemy):
             self.wheels.unpause()
         else: self.wheels.pause()
         self.wheels.update(time_passed)
-        if self.update_angle(worm):
+        if self.aiming:
             self.shot_timer += time_passed
             if self.shot_timer >= self.shoot_time: self.shoot(worm)
         else: self.shot_timer = 0
-        return (worm.pos - self.pos).length
 
     def dead_update(self, time_passed):
         self.velocity += 0, 0.5
         self.pos += self.velocity
         self.rot_speed *= 0.95
         self.rotation += self.rot_speed
-        super(Warthog, self).update(time_passed, None)
+        super(Warthog, self).act(time_passed, None)
         self.fire.update(time_passed, self.pos.y < self.ground_pos)
         if (self.pos.y > self.ground_pos + 100 and
-            len(self.fire.fire_parts) == 0):
+            len(self.fire) == 0):
             self.gone = True
-        return 100
 
-    def update(self, time_passed, worm):
-        if self.dead: return self.dead_update(time_passed)
-        else: return self.alive_update(time_passed, worm)
+    def remember_pos(self):
+        super(Warthog, self).remember_pos()
+        self.wheels.remember_pos()
 
-    def update_angle(self, worm):
-        t_sep = self.turret_sep if self.direction == "r" else self.turret_sep*(-1, 1)
-        turret_pos = self.pos + t_sep
-        pos_sep = worm.pos - turret_pos
-        dist = pos_sep.length
-        if dist > 800 or worm.in_ground(): self.angle = "straight"; return False
-        angle = -pos_sep.angle
-        if angle < -90: angle += 360
-        dir_angle = -abs(angle - 90) + 90
-        if dir_angle < -15: self.angle = "d2"
-        elif -15 <= dir_angle < -5: self.angle = "d1"
-        elif -5 <= dir_angle < 7.5: self.angle = "straight"
-        elif 7.5 <= dir_angle < 20.5: self.angle = "u1"
-        elif 20.5 <= dir_angle < 28: self.angle = "u2"
-        else: self.angle = "u3"
-        if pos_sep.x > 0:
-            self.shoot_dir = "front" if self.direction == "r" else "back"
-        else:
-            self.shoot_dir = "back" if self.direction == "r" else "front"
-        return True
+    def mark_dirty(self, tracker):
+        super(Warthog, self).mark_dirty(tracker)
+        if self.dead: self.fire.mark_dirty(tracker)
+        else: self.wheels.mark_dirty(tracker)
 
     def shoot(self, worm):
         self.shot_timer = 0
@@ -431,9 +697,15 @@ class Warthog(Enemy):
         d_x = direction * turret_len * math.cos(math.radians(angles[self.angle]))
         d_y = -turret_len * math.sin(math.radians(angles[self.angle]))
         bullet_pos = turret_pos + (d_x, d_y)
-        self.bullets.append(Bullet(self.screen, self.camera, bullet_pos, 14, 
+        self.bullets.add(Bullet.pool.acquire(
+            self.screen, self.camera, bullet_pos, 14, 
             worm.pos - turret_pos, 5, bullet_type="warthog"))
 
+    def bounds(self):
+        bounds = super(Warthog, self).bounds()
+        if self.dead: return bounds.union(self.fire.bounds())
+        return bounds.union(self.wheels.bounds())
+
     def blit_me(self):
         super(Warthog, self).blit_me(self.direction == "l")
         if self.dead: self.fire.blit_me()
@@ -451,7 +723,7 @@ class Warthog(Enemy):
         self.current_anim.update(0, self.pos)
         self.velocity = vec2d(worm_vel.x, 0) + (0, random.randint(-10, -5))
         self.rot_speed = 30
-        self.fire = Fire(self.screen, self.camera, self)
+        self.fire = self.fire_type(self.screen, self.camera, self)
         self.fire.update(0)
 
     def death_sound(self, sound_man):
@@ -0,0 +1,100 @@
+from itertools import chain
+from collections import OrderedDict
+
+SLOT_BITS = 32
+SLOT_MASK = (1 << SLOT_BITS) - 1
+
+class EntityStore(object):
+    ''' Unordered entity collection with O(1) add and remove
+        items of each type sit in their own dense list, removal swaps
+        the last item of that list into the hole, and ids carry a
+        generation so an id of a removed entity never matches again
+        '''
+    def __init__(self):
+        self.groups = OrderedDict()
+        self.group_slots = dict()
+        self.generations = []
+        self.slot_group = []
+        self.slot_index = []
+        self.free_slots = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return chain(*self.groups.values())
+
+    def __nonzero__(self):
+        return self.count > 0
+
+    def of_type(self, item_type):
+        return self.groups.get(item_type, [])
+
+    # (type, dense list) pairs in the order the types were first added #
+    def by_type(self):
+        return self.groups.items()
+
+    def add(self, item):
+        item_type = type(item)
+        group = self.groups.get(item_type)
+        if group is None:
+            group = self.groups[item_type] = []
+            self.group_slots[item_type] = []
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = len(self.generations)
+            self.generations.append(0)
+            self.slot_group.append(None)
+            self.slot_index.append(0)
+        self.slot_group[slot] = item_type
+        self.slot_index[slot] = len(group)
+        group.append(item)
+        self.group_slots[item_type].append(slot)
+        self.count += 1
+        return (self.generations[slot] << SLOT_BITS) | slot
+
+    def get(self, eid):
+        slot = eid & SLOT_MASK
+        if (slot >= len(self.generations) or
+            self.generations[slot] != eid >> SLOT_BITS or
+            self.slot_group[slot] is None):
+            return None
+        return self.groups[self.slot_group[slot]][self.slot_index[slot]]
+
+    def remove(self, eid):
+        slot = eid & SLOT_MASK
+        if self.get(eid) is None: raise KeyError("stale entity id %d" % eid)
+        item_type = self.slot_group[slot]
+        self._swap_remove(item_type, self.slot_index[slot])
+
+    def _swap_remove(self, item_type, i):
+        group, slots = self.groups[item_type], self.group_slots[item_type]
+        item, slot = group[i], slots[i]
+        last = len(group) - 1
+        if i != last:
+            group[i] = group[last]
+            slots[i] = slots[last]
+            self.slot_index[slots[i]] = i
+        group.pop()
+        slots.pop()
+        self.slot_group[slot] = None
+        self.generations[slot] += 1
+        self.free_slots.append(slot)
+        self.count -= 1
+        return item
+
+    # remove every item for which predicate is true, returns them  #
+    # each group is walked backwards so swapped-in items were      #
+    # already visited, predicate may update the item it is given   #
+    def remove_if(self, predicate):
+        removed = []
+        for item_type, group in self.groups.items():
+            for i in xrange(len(group) - 1, -1, -1):
+                if predicate(group[i]):
+                    removed.append(self._swap_remove(item_type, i))
+        return removed
+
+    def clear(self):
+        self.__init__()
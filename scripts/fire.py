@@ -1,56 +1,100 @@
-from animatedSprite import AnimatedSprite, ImageHolder
-from vec2d import vec2d
-from random import randint as ri
-from random import choice as rc
+import pygame, random
+import numpy as np
+from animatedSprite import ImageHolder
 
-class FireParticle(AnimatedSprite):
+class Fire(object):
+    ''' Fire emitter attached to a burning item
+        particles live in a fixed-capacity pool of arrays and play the
+        fire/part flipbook once before being recycled
+        '''
     @classmethod
     def init(cls):
-        cls.anims = []
-        cls.anims.append(ImageHolder.load_anim('fire', 'part'))
-
-    def __init__(self, screen, camera, pos):
-        super(FireParticle, self).__init__(
-            screen, camera, pos, 'fire', FireParticle.anims)
-        self.play()
-        super(FireParticle, self).update(0)
-        self.velocity = vec2d(0, ri(-4, -2))
-        self.gone = False
-        self.played = False
-
-    def update(self, time_passed):
-        super(FireParticle, self).update(time_passed)
-        choices = [-1, 0, 1]
-        sx = int(abs(self.velocity.x))
-        choices += [-1 if self.velocity.x > 0 else 1]*sx
-        self.velocity.x += rc(choices)
-        self.pos += self.velocity
-        if self.current_anim.frame > 0: self.played = True
-        if self.current_anim.frame == 0 and self.played:
-            self.gone = True
+        cls.flipbook = ImageHolder.load_anim('fire', 'part')
+        cls.frame_ends = np.cumsum(cls.flipbook.frame_times)
+        cls.lifetime = cls.frame_ends[-1]
+        cls.half_sizes = [(w / 2, h / 2) for w, h in cls.flipbook.sizes]
+        cls.half_size_array = np.array(cls.half_sizes, dtype=float)
+        cls.max_half_size = (max(w for w, h in cls.half_sizes),
+                             max(h for w, h in cls.half_sizes))
 
-class Fire(object):
-    def __init__(self, screen, camera, item):
+    def __init__(self, screen, camera, item, rate=30.0, capacity=48):
         self.screen = screen
         self.camera = camera
         self.pos = item.pos
         self.item = item
-        self.fire_parts = [FireParticle(screen, camera, item.pos)]
+        self.rate = rate
+        self.capacity = capacity
+        self.rng = np.random.RandomState(random.getrandbits(32))
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.part_pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.age = np.zeros(capacity)
+        self.spawn_time = 0.0
+        self.count = 0
+        self.spawn(1)
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, amount):
+        free = np.flatnonzero(~self.alive)[:amount]
+        n = len(free)
+        if n == 0: return
+        self.alive[free] = True
+        self.part_pos[free] = (self.pos.x, self.pos.y)
+        self.velocity[free, 0] = 0
+        self.velocity[free, 1] = self.rng.randint(-4, -1, n)
+        self.age[free] = 0.0
+        self.count += n
 
     def update(self, time_passed, add_fire=True):
-        f = 0
-        fp_count = len(self.fire_parts)
-        while f < fp_count:
-            part = self.fire_parts[f]
-            part.update(time_passed)
-            if part.gone: self.fire_parts.pop(f); fp_count -= 1
-            else: f += 1
+        alive = self.alive
+        if self.count:
+            self.age[alive] += time_passed
+            vx = self.velocity[alive, 0]
+            # random walk biased back towards zero sideways speed #
+            pull = np.abs(vx).astype(np.int32)
+            pick = (self.rng.random_sample(len(vx)) * (3 + pull)).astype(
+                                                                    np.int32)
+            back = np.where(vx > 0, -1, 1)
+            self.velocity[alive, 0] = vx + np.where(pick < 3, pick - 1, back)
+            self.part_pos[alive] += self.velocity[alive]
+            alive &= self.age < Fire.lifetime
+            self.count = int(alive.sum())
         self.pos = self.item.pos
-        screen, camera, pos = self.screen, self.camera, self.pos
-        if add_fire: self.fire_parts.append(FireParticle(screen, camera, pos))
+        if add_fire:
+            self.spawn_time += time_passed * self.rate
+            due = int(self.spawn_time)
+            if due:
+                self.spawn_time -= due
+                self.spawn(due)
+        else: self.spawn_time = 0.0
 
-    def blit_me(self):
-        for p in self.fire_parts:
-            p.blit_me()
+    # world rect around every live particle #
+    def bounds(self):
+        if not self.count: return pygame.Rect(self.pos.x, self.pos.y, 0, 0)
+        pos = self.part_pos[self.alive]
+        hw, hh = Fire.max_half_size
+        left, top = pos.min(axis=0) - (hw, hh)
+        right, bottom = pos.max(axis=0) + (hw, hh)
+        return pygame.Rect(int(left), int(top), int(right - left) + 1,
+                           int(bottom - top) + 1)
+
+    def mark_dirty(self, tracker):
+        if not self.count: return
+        tracker.add(self.camera.rect_world_to_screen(self.bounds()))
 
-FireParticle.init()
\ No newline at end of file
+    def blit_me(self):
+        if not self.count: return
+        index = np.flatnonzero(self.alive)
+        frames = np.searchsorted(Fire.frame_ends, self.age[index],
+                                 side='right')
+        pos = self.part_pos[index]
+        half = Fire.half_size_array[frames]
+        rects = np.column_stack((pos - half, half*2))
+        shown = np.flatnonzero(self.camera.rects_on_screen(rects))
+        corners = self.camera.world_to_screen_array(pos[shown] - half[shown])
+        images = Fire.flipbook.images
+        blit = self.screen.blit
+        for (x, y), frame in zip(corners.tolist(), frames[shown].tolist()):
+            blit(images[frame], (x, y))
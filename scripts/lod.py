@@ -0,0 +1,49 @@
+class LODPolicy(object):
+    ''' Picks which entities get a full update each step
+        entities within margin of the camera's view are near and update
+        every step; far ones are split into interval slices of their
+        type's list and one slice ticks per step, catching up on the
+        steps it skipped in one coarse move. Items keep the step of
+        their last update in lod_step, set by track when they are added
+        '''
+    def __init__(self, camera, interval=4, margin=None):
+        self.camera = camera
+        self.interval = interval
+        self.margin = camera.width / 4 if margin is None else margin
+        self.step = 0
+        self.near = []
+        self.near_by_type = dict()
+
+    # a new item counts as updated at the current step, so its first #
+    # catch up covers every step it has been around for               #
+    def track(self, item):
+        item.lod_step = self.step
+
+    # finds the near items in index, an AxisIndex, for this step #
+    def begin(self, index):
+        self.step += 1
+        camera, step = self.camera, self.step
+        half = camera.width / 2
+        self.near = index.query(camera.pos.x + half, half + self.margin)
+        by_type = dict()
+        for item in self.near:
+            item.lod_step = step
+            by_type.setdefault(type(item), []).append(item)
+        self.near_by_type = by_type
+
+    # (near, far) items of one type's list to update this step #
+    def split(self, item_type, group):
+        step, interval = self.step, self.interval
+        near = self.near_by_type.get(item_type, [])
+        far = [item for item in group[step % interval::interval]
+               if item.lod_step != step]
+        return near, far
+
+    # steps each far item has to catch up on, stamping this step #
+    def catch_up(self, items):
+        step = self.step
+        steps = []
+        for item in items:
+            steps.append(step - item.lod_step)
+            item.lod_step = step
+        return steps
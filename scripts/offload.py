@@ -0,0 +1,376 @@
+''' Particles and enemy decisions simulated in a worker process
+
+    Worker starts the process and stands in for what it simulates. Each
+    step the main process queues what the worker needs: blood
+    explosions, where the burning warthogs are, new dirt, and the
+    columns of every enemy it updated. step() pipes all of it over. The
+    worker runs a BloodSystem, a Fire per burning warthog, the worm's
+    dirt trail and each enemy type's decision pass. Then it writes the
+    results into the back one of two shared-memory buffers and flips
+    which one is the front.
+
+    The main process never waits for the worker. sync() copies the
+    particles of the front buffer once per drawn frame. receive() takes
+    the decisions of the newest finished step at the start of the next
+    one, so enemies act on decisions a step old (more when the worker
+    falls behind). Which step that is depends on scheduling, so runs
+    with a worker cannot be recorded or replayed.
+    '''
+import random, signal
+import numpy as np
+from multiprocessing import Process, Pipe, Lock
+from multiprocessing.sharedctypes import RawArray, RawValue
+from blood import BloodSystem
+from fire import Fire
+from entities import EntityStore
+from enemies import worm_state
+from worm import fade_dirt
+from vec2d import vec2d
+
+# rows a snapshot holds of each kind, the rest are simulated but not #
+# published                                                          #
+CAPACITY = {"blood": 8192, "fire": 4096, "emitters": 256, "dirt": 1024,
+            "enemies": 4096}
+
+# (name, rows, [(column, dtype, width)]) of every table in a snapshot, #
+# one table of decisions per enemy type                                #
+def table_specs(enemy_types):
+    specs = [("blood", CAPACITY["blood"], [("pos", np.float64, 2),
+                                           ("radius", np.float64, 1),
+                                           ("color", np.int32, 1)]),
+             ("fire", CAPACITY["fire"], [("pos", np.float64, 2),
+                                         ("age", np.float64, 1)]),
+             ("emitters", CAPACITY["emitters"], [("key", np.int32, 1),
+                                                 ("count", np.int32, 1)]),
+             ("dirt", CAPACITY["dirt"], [("pos", np.float64, 2),
+                                         ("color", np.int32, 3),
+                                         ("duration", np.float64, 1)])]
+    for enemy_type in enemy_types:
+        columns = [("eid", np.int64, 1), ("near", np.bool_, 1)]
+        columns += [(name, np.int32, 1) for name in enemy_type.decision_fields]
+        specs.append((enemy_type.__name__, CAPACITY["enemies"], columns))
+    return specs
+
+class SharedSnapshot(object):
+    ''' Two buffers of tables in shared memory, with the index of the
+        finished one and, per buffer, the step it holds and the row
+        count of every table
+        '''
+    def __init__(self, specs):
+        self.specs = specs
+        self.names = [name for name, rows, columns in specs]
+        self.raw = [[[RawArray('b', rows*width*np.dtype(dtype).itemsize)
+                      for column, dtype, width in columns]
+                     for name, rows, columns in specs] for _ in xrange(2)]
+        self.counts = RawArray('i', 2*len(specs))
+        self.steps = RawArray('i', 2)
+        self.front = RawValue('i', 0)
+        self.lock = Lock()
+
+    # numpy views of buffer i by table and column, made in each #
+    # process after the fork                                    #
+    def views(self, i):
+        views = dict()
+        for (name, rows, columns), raws in zip(self.specs, self.raw[i]):
+            table = views[name] = dict()
+            for (column, dtype, width), raw in zip(columns, raws):
+                array = np.frombuffer(raw, dtype=dtype)
+                if width > 1: array = array.reshape(rows, width)
+                table[column] = array
+        return views
+
+    def count(self, i, name):
+        return self.counts[i*len(self.names) + self.names.index(name)]
+
+    # make buffer i, holding step with counts by table name, the front #
+    def flip(self, i, step, counts):
+        with self.lock:
+            for t, name in enumerate(self.names):
+                self.counts[i*len(self.names) + t] = counts.get(name, 0)
+            self.steps[i] = step
+            self.front.value = i
+
+class Anchor(object):
+    ''' Where a burning warthog is, for the worker's Fire to follow '''
+    def __init__(self, x, y):
+        self.pos = vec2d(x, y)
+
+# write rows index of a decision into table from row start on, as far #
+# as it has room; returns the row after the last one written         #
+def publish_decisions(table, start, enemy_type, eids, near, decision, index):
+    n = max(0, min(len(index), len(table["eid"]) - start))
+    index = index[:n]
+    rows = slice(start, start + n)
+    table["eid"][rows] = eids[index]
+    table["near"][rows] = near
+    for column in enemy_type.decision_fields:
+        # far decisions only wander, their other columns are unused #
+        table[column][rows] = (decision[column][index] if column in decision
+                               else 0)
+    return start + n
+
+def run_worker(conn, snapshot, blood_state, fire_lifetime, seed):
+    # the handler SDL installed in the parent would swallow terminate() #
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    blood = BloodSystem(None)
+    blood.rng.set_state(blood_state)
+    Fire.lifetime = fire_lifetime
+    fires = dict()
+    dirt = EntityStore()
+    rng = np.random.RandomState(seed)
+    buffers = [snapshot.views(i) for i in xrange(2)]
+    back = 1
+    while True:
+        try: message = conn.recv()
+        except EOFError: break
+        if message is None: break
+        (step, time_passed, explosions, burning, new_dirt, worm,
+         batches) = message
+        tables = buffers[back]
+        counts = dict()
+        for args in explosions:
+            blood.explode(*args)
+        blood.update(time_passed)
+        n = min(blood.count, len(tables["blood"]["radius"]))
+        for column in ("pos", "radius", "color"):
+            tables["blood"][column][:n] = getattr(blood, column)[:n]
+        counts["blood"] = n
+        # fires no longer mentioned belong to warthogs that are gone #
+        still_burning = dict()
+        for key, x, y, fire_time, add_fire in burning:
+            fire = fires.get(key)
+            if fire is None: fire = Fire(None, None, Anchor(x, y))
+            else: fire.item.pos = vec2d(x, y)
+            fire.update(fire_time, add_fire)
+            still_burning[key] = fire
+        fires = still_burning
+        particles, emitters = tables["fire"], tables["emitters"]
+        shown = fires.items()[:len(emitters["key"])]
+        start = 0
+        for e, (key, fire) in enumerate(shown):
+            index = np.flatnonzero(fire.alive)[:len(particles["age"]) - start]
+            n = len(index)
+            particles["pos"][start:start+n] = fire.part_pos[index]
+            particles["age"][start:start+n] = fire.age[index]
+            emitters["key"][e], emitters["count"][e] = key, n
+            start += n
+        counts["emitters"], counts["fire"] = len(shown), start
+        dirt.remove_if(fade_dirt)
+        for x, y, color, duration in new_dirt:
+            dirt.add([vec2d(x, y), color, duration])
+        table = tables["dirt"]
+        for i, (pos, color, duration) in enumerate(
+                list(dirt)[:len(table["duration"])]):
+            table["pos"][i] = pos.x, pos.y
+            table["color"][i] = color
+            table["duration"][i] = duration
+            counts["dirt"] = i + 1
+        for enemy_type, eids, state, steps in batches:
+            if steps is None:
+                decision = enemy_type.decide(state, worm, rng)
+                index = enemy_type.rows(state, decision)
+            else:
+                decision = enemy_type.decide_far(state, steps, rng)
+                index = enemy_type.changed(state, decision)
+            name = enemy_type.__name__
+            counts[name] = publish_decisions(tables[name], counts.get(name, 0),
+                                             enemy_type, eids, steps is None,
+                                             decision, index)
+        snapshot.flip(back, step, counts)
+        back = 1 - back
+    conn.close()
+
+class OffloadedBlood(BloodSystem):
+    ''' BloodSystem whose droplets are simulated in the worker
+        explode() calls are queued for Worker.step(), the arrays drawn
+        from are the snapshot last copied by Worker.sync()
+        '''
+    def __init__(self, screen, worker):
+        super(OffloadedBlood, self).__init__(screen, CAPACITY["blood"])
+        self.worker = worker
+
+    def explode(self, amount, power, pos, ground_y):
+        self.worker.explosions.append((amount, power, (pos[0], pos[1]),
+                                       ground_y))
+        self.spawned += amount
+
+    # stepped in the worker #
+    def update(self, time_passed): pass
+
+class OffloadedFire(Fire):
+    ''' Fire whose particles are simulated in the worker
+        update() only tells the worker where the burning item is, the
+        arrays drawn from are the snapshot last copied by Worker.sync()
+        '''
+    def __init__(self, worker, screen, camera, item):
+        super(OffloadedFire, self).__init__(screen, camera, item)
+        self.worker = worker
+        self.key = worker.add_fire(self)
+
+    def update(self, time_passed, add_fire=True):
+        self.pos = self.item.pos
+        self.worker.burning.append((self.key, self.pos.x, self.pos.y,
+                                    time_passed, add_fire))
+
+    def sync(self, pos, age):
+        n = len(age)
+        self.part_pos[:n] = pos
+        self.age[:n] = age
+        self.alive[:n] = True
+        self.alive[n:] = False
+        self.count = n
+
+class OffloadedDirt(object):
+    ''' Stands in for Worm.dirt_list, the dirt fading in the worker
+        new dirt is queued for Worker.step(), iterating gives the
+        [pos, color, duration] entries last copied by Worker.sync()
+        '''
+    def __init__(self, worker):
+        self.worker = worker
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def add(self, dirt):
+        pos, color, duration = dirt
+        self.worker.new_dirt.append((pos.x, pos.y, color, duration))
+
+    # faded in the worker #
+    def remove_if(self, predicate):
+        return []
+
+    def sync(self, pos, color, duration):
+        self.entries = [[vec2d(x, y), tuple(rgb), size]
+                        for (x, y), rgb, size in zip(pos.tolist(),
+                                                     color.tolist(),
+                                                     duration.tolist())]
+
+class Worker(object):
+    ''' The worker process and the main process's side of it
+        blood, dirt and fire (as fire_type for Warthog) stand in for the
+        in-process systems, update_enemies for the in-process enemy
+        updates; see the module docstring
+        '''
+    def __init__(self, screen, enemy_types):
+        self.enemy_types = enemy_types
+        self.blood = OffloadedBlood(screen, self)
+        self.dirt = OffloadedDirt(self)
+        self.fires = dict()
+        self.next_key = 0
+        self.snapshot = SharedSnapshot(table_specs(enemy_types))
+        self.front = [self.snapshot.views(i) for i in xrange(2)]
+        self.step_count = 0
+        # step of the decisions taken last, each set is taken once #
+        self.decided_step = 0
+        self.decisions = dict()
+        self.explosions, self.burning, self.new_dirt = [], [], []
+        self.batches = []
+        self.conn, child_conn = Pipe()
+        # the worker carries on from this process's blood generator, so #
+        # it makes the same droplets an in-process BloodSystem would     #
+        self.process = Process(target=run_worker,
+                               args=(child_conn, self.snapshot,
+                                     self.blood.rng.get_state(),
+                                     Fire.lifetime, random.getrandbits(32)))
+        self.process.daemon = True
+        self.process.start()
+
+    # a Fire for Warthog.fire_type #
+    def fire(self, screen, camera, item):
+        return OffloadedFire(self, screen, camera, item)
+
+    def add_fire(self, fire):
+        self.next_key += 1
+        self.fires[self.next_key] = fire
+        return self.next_key
+
+    # take the newest decisions the worker finished, if not taken yet; #
+    # the particles are synced too, burnt out fires end the warthogs   #
+    # they belong to whether or not frames are drawn                   #
+    def receive(self):
+        self.sync()
+        self.decisions.clear()
+        snapshot = self.snapshot
+        with snapshot.lock:
+            i = snapshot.front.value
+            if snapshot.steps[i] <= self.decided_step: return
+            self.decided_step = snapshot.steps[i]
+            for enemy_type in self.enemy_types:
+                name = enemy_type.__name__
+                n = snapshot.count(i, name)
+                table = self.front[i][name]
+                self.decisions[enemy_type] = dict(
+                    (column, table[column][:n].copy()) for column in
+                    ("eid", "near") + enemy_type.decision_fields)
+
+    # update_all and update_far, on the decisions taken by receive #
+    # for enemies still in store, then queue near and far for the  #
+    # next decisions                                               #
+    def update_enemies(self, enemy_type, store, near, far, steps,
+                       time_passed, worm):
+        decision = self.decisions.pop(enemy_type, None)
+        if decision is not None:
+            found = [store.get(eid) for eid in decision["eid"].tolist()]
+            present = [i for i, enemy in enumerate(found)
+                       if type(enemy) is enemy_type]
+            near_rows = decision["near"]
+            enemy_type.apply(found, decision,
+                             [i for i in present if near_rows[i]],
+                             time_passed, worm)
+            far_rows = [i for i in present if not near_rows[i]]
+            if far_rows: enemy_type.apply_wander(found, decision, far_rows)
+        for enemy in near:
+            enemy.act(time_passed, worm)
+        for enemy, count in zip(far, steps):
+            enemy.move(count)
+        for enemies, enemy_steps in ((near, None), (far, steps)):
+            if not enemies: continue
+            eids = np.array([enemy.eid for enemy in enemies], dtype=np.int64)
+            self.batches.append((enemy_type, eids,
+                                 enemy_type.columns(enemies), enemy_steps))
+
+    # send this step's work to the worker #
+    def step(self, time_passed, worm):
+        self.step_count += 1
+        self.conn.send((self.step_count, time_passed, self.explosions,
+                        self.burning, self.new_dirt, worm_state(worm),
+                        self.batches))
+        self.fires = dict((entry[0], self.fires[entry[0]])
+                          for entry in self.burning)
+        self.explosions, self.burning, self.new_dirt = [], [], []
+        self.batches = []
+
+    # copy the particles of the front snapshot for drawing #
+    def sync(self):
+        snapshot = self.snapshot
+        blood = self.blood
+        with snapshot.lock:
+            i = snapshot.front.value
+            tables = self.front[i]
+            n = snapshot.count(i, "blood")
+            for column in ("pos", "radius", "color"):
+                getattr(blood, column)[:n] = tables["blood"][column][:n]
+            blood.count = n
+            particles, emitters = tables["fire"], tables["emitters"]
+            start = 0
+            shown = snapshot.count(i, "emitters")
+            for key, count in zip(emitters["key"][:shown].tolist(),
+                                  emitters["count"][:shown].tolist()):
+                fire = self.fires.get(key)
+                if fire is not None:
+                    fire.sync(particles["pos"][start:start+count],
+                              particles["age"][start:start+count])
+                start += count
+            n = snapshot.count(i, "dirt")
+            table = tables["dirt"]
+            self.dirt.sync(table["pos"][:n], table["color"][:n],
+                           table["duration"][:n])
+
+    def close(self):
+        if self.process.is_alive():
+            self.conn.send(None)
+            self.process.join(1.0)
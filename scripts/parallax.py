@@ -0,0 +1,81 @@
+import pygame
+import assets
+
+class ParallaxLayer(object):
+    ''' One background layer, drawn as tiles following a camera
+        the layer is a row of equally wide image strips repeating along
+        x. Strips are loaded and cut into tiles when they come into view
+        and dropped again once they are more than margin strips away.
+        Tiles that are fully opaque are blitted without alpha, fully
+        transparent tiles are skipped.
+        '''
+    def __init__(self, screen, camera, filenames, tile_size=256, margin=1):
+        if isinstance(filenames, basestring): filenames = [filenames]
+        self.screen = screen
+        self.camera = camera
+        self.filenames = filenames
+        self.tile_size = tile_size
+        self.margin = margin
+        self.strips = dict()
+        self.strip_width = None
+        self.load_strip(0)
+
+    def load_strip(self, index):
+        image = assets.image(self.filenames[index])
+        has_alpha = image.get_flags() & pygame.SRCALPHA
+        image = image.convert_alpha() if has_alpha else image.convert()
+        width, height = image.get_size()
+        if self.strip_width is None:
+            self.strip_width, self.strip_height = width, height
+        tiles = []
+        size = self.tile_size
+        for y in xrange(0, height, size):
+            for x in xrange(0, width, size):
+                rect = pygame.Rect(x, y, min(size, width - x),
+                                   min(size, height - y))
+                tile = split_tile(image.subsurface(rect), has_alpha)
+                if tile is not None:
+                    tiles.append((x, y, rect.width, tile))
+        self.strips[index] = tiles
+        return tiles
+
+    def blit_me(self):
+        cam_x = self.camera.draw_pos.x
+        cam_y = self.camera.draw_pos.y
+        screen_w = self.screen.get_width()
+        strip_w, count = self.strip_width, len(self.filenames)
+        first = int(cam_x // strip_w)
+        last = int((cam_x + screen_w) // strip_w)
+        blit = self.screen.blit
+        for k in xrange(first, last + 1):
+            tiles = self.strips.get(k % count)
+            if tiles is None: tiles = self.load_strip(k % count)
+            base_x = int(k * strip_w - cam_x)
+            base_y = int(-cam_y)
+            for x, y, w, tile in tiles:
+                draw_x = base_x + x
+                if draw_x + w > 0 and draw_x < screen_w:
+                    blit(tile, (draw_x, base_y + y))
+        if len(self.strips) > 1: self.evict(first, last)
+
+    def evict(self, first, last):
+        count = len(self.filenames)
+        if last - first + 1 + 2*self.margin >= count: return
+        keep = set(k % count for k in xrange(first - self.margin,
+                                              last + self.margin + 1))
+        for index in self.strips.keys():
+            if index not in keep: del self.strips[index]
+
+# tile as a surface to blit, or None if nothing in it is visible #
+def split_tile(tile, has_alpha):
+    if not has_alpha: return tile.copy()
+    alpha = pygame.surfarray.pixels_alpha(tile)
+    lowest, highest = alpha.min(), alpha.max()
+    del alpha
+    if highest == 0: return None
+    if lowest == 255:
+        # converting keeps SRCALPHA with a surface alpha of 0, drop it #
+        tile = tile.convert()
+        tile.set_alpha(None)
+        return tile
+    return tile.copy()
@@ -0,0 +1,177 @@
+import pygame, csv
+from collections import deque
+from timeit import default_timer as timer
+from text import FontManager
+
+class Section(object):
+    ''' Times one named part of a frame, used as a with block
+        sections nest, and a section entered several times in a frame
+        (one per simulation step) adds up
+        '''
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.depth += 1
+        self.start = timer()
+
+    def __exit__(self, *exc_info):
+        profiler = self.profiler
+        profiler.add(self.name, timer() - self.start)
+        profiler.depth -= 1
+
+class FrameProfiler(object):
+    ''' Rolling history of where each frame's time went
+        every frame keeps the seconds spent in each section and the
+        entity counts at its end; the last history frames are kept for
+        the overlay and for export as CSV
+        '''
+    def __init__(self, history=600):
+        self.history = deque(maxlen=history)
+        self.sections = dict()
+        # section names in the order first seen, with their depth #
+        self.names = []
+        self.depths = dict()
+        self.depth = 0
+        self.frames = 0
+        self.current = dict()
+        self.frame_start = timer()
+
+    def section(self, name):
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = Section(self, name)
+            self.names.append(name)
+            self.depths[name] = self.depth
+        return section
+
+    def add(self, name, seconds):
+        current = self.current
+        current[name] = current.get(name, 0.0) + seconds
+
+    def begin_frame(self):
+        self.current = dict()
+        self.frame_start = timer()
+
+    def end_frame(self, counts=None):
+        self.current["frame"] = timer() - self.frame_start
+        self.history.append((self.current, counts or dict()))
+        self.frames += 1
+
+    # milliseconds spent in name by each of the last frames #
+    def column(self, name, frames=None):
+        history = self.history
+        if frames is not None:
+            history = list(history)[-frames:]
+        return [times.get(name, 0.0) * 1000 for times, counts in history]
+
+    def mean(self, name, frames=None):
+        values = self.column(name, frames)
+        if not values: return 0.0
+        return sum(values) / len(values)
+
+    def write_csv(self, path):
+        count_names = sorted(set(name for times, counts in self.history
+                                 for name in counts))
+        first = self.frames - len(self.history)
+        with open(path, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "frame_ms"] +
+                            [name + "_ms" for name in self.names] +
+                            count_names)
+            for i, (times, counts) in enumerate(self.history):
+                writer.writerow([first + i, "%.3f" % (times["frame"]*1000)] +
+                                ["%.3f" % (times.get(name, 0.0)*1000)
+                                 for name in self.names] +
+                                [counts.get(name, 0) for name in count_names])
+
+class ProfileOverlay(object):
+    ''' Frame time graph and section means drawn over the game
+        the graph scrolls one pixel per frame, green under the frame
+        budget and red over it; the text is refreshed a few times a
+        second so it stays readable and cheap to draw
+        '''
+    bg_color = (20, 20, 20)
+    text_color = (230, 230, 230)
+    ok_color = (60, 200, 60)
+    slow_color = (220, 60, 60)
+    budget_color = (120, 120, 120)
+
+    def __init__(self, profiler, budget_ms, pos=(10, 10), width=300,
+                 graph_height=60, refresh=15):
+        self.profiler = profiler
+        self.budget_ms = budget_ms
+        self.pos = pos
+        self.width = width
+        self.refresh = refresh
+        self.font = FontManager("arial", 14, max_entries=128)
+        self.graph = pygame.Surface((width, graph_height))
+        self.graph.fill(self.bg_color)
+        self.panel = None
+        self.shown = False
+        self.rect = pygame.Rect(pos, (width, graph_height))
+
+    def toggle(self):
+        self.shown = not self.shown
+        if self.shown: self.update_panel()
+
+    # one new column of the graph, the scale is twice the budget #
+    def update_graph(self, frame_ms):
+        graph = self.graph
+        width, height = graph.get_size()
+        graph.scroll(-1, 0)
+        x = width - 1
+        graph.fill(self.bg_color, (x, 0, 1, height))
+        bar = min(height, int(height * frame_ms / (2 * self.budget_ms)))
+        color = self.slow_color if frame_ms > self.budget_ms else self.ok_color
+        if bar > 0: graph.fill(color, (x, height - bar, 1, bar))
+        graph.set_at((x, height / 2), self.budget_color)
+
+    # (label, value) rows of the panel #
+    def text_lines(self):
+        profiler = self.profiler
+        window = min(len(profiler.history), 30)
+        lines = [("frame ms", "%.2f" % profiler.mean("frame", window)),
+                 ("  max", "%.2f" % max(profiler.column("frame", window)
+                                        or [0.0]))]
+        for name in profiler.names:
+            indent = "  " * profiler.depths[name]
+            lines.append((indent + name,
+                          "%.2f" % profiler.mean(name, window)))
+        if profiler.history:
+            counts = profiler.history[-1][1]
+            for name in sorted(counts):
+                lines.append((name, "%d" % counts[name]))
+        return lines
+
+    def update_panel(self):
+        lines = self.text_lines()
+        font = self.font
+        height = font.height * len(lines) + 4
+        if self.panel is None or self.panel.get_height() != height:
+            self.panel = pygame.Surface((self.width, height))
+        self.panel.fill(self.bg_color)
+        for i, (label, value) in enumerate(lines):
+            y = 2 + font.height*i
+            font.write_line(self.panel, 4, y, label, self.text_color)
+            value_x = self.width - 4 - font.size(value)[0]
+            font.write_line(self.panel, value_x, y, value, self.text_color)
+        x, y = self.pos
+        self.rect = pygame.Rect(x, y, self.width,
+                                self.graph.get_height() + height)
+
+    # called once per frame whether shown or not, so the graph has no gaps #
+    def update(self):
+        history = self.profiler.history
+        if not history: return
+        self.update_graph(history[-1][0]["frame"] * 1000)
+        if self.shown and self.profiler.frames % self.refresh == 0:
+            self.update_panel()
+
+    def draw(self, screen):
+        x, y = self.pos
+        screen.blit(self.graph, (x, y))
+        screen.blit(self.panel, (x, y + self.graph.get_height()))
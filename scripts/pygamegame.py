@@ -1,23 +1,46 @@
-import pygame, sys
+import pygame, sys, random
+from timeit import default_timer as timer
+from dirty import DirtyTracker
+from profiler import FrameProfiler, ProfileOverlay
+from replay import Recording, Replayer
 
 class PygameGame(object):
     ''' Pygame Game basis class
         modeled after Animation class from 15-112 at CMU
         '''
+    profile_csv = None
+    profile_history = 600
+    recording = None
+    record_path = None
+
     ##### INTERFACE #####
 
     ''' Override these functions '''
     # define initialization behavior #
     def init(self): pass
     # define frame-by-frame behavior #
-    #    time_passed: time, in ms, since last frame #
+    #    time_passed: time, in seconds, of one simulation step #
     def timer_fired(self, time_passed): pass
+    # save whatever redraw_all interpolates from, before each step #
+    def remember_state(self): pass
+    # prepare to draw alpha of the way between the last two steps #
+    def interpolate(self, alpha): pass
     # define key press behavior #
     def key_pressed(self, key): pass
     # define key release behavior #
     def key_released(self, key): pass
     # define drawing behavior #
     def redraw_all(self): pass
+    # with dirty rects on: anything that changes when the whole view  #
+    # changes (camera positions), a change forces a full repaint      #
+    def view_key(self): return None
+    # with dirty rects on: add this frame's screen rects to tracker,  #
+    # the default asks for a full repaint every frame                 #
+    def dirty_rects(self, tracker): tracker.invalidate()
+    # entity counts recorded with each frame's timings #
+    def entity_counts(self): return dict()
+    # simulation state a replay must reproduce exactly, checksummed #
+    def state_key(self): return None
     # define exit behavior #
     def exit(self): pass
 
@@ -25,12 +48,58 @@ class PygameGame(object):
     # is_key_down(_key_)
     #    True if _key_ is pressed
     #    else False
+    # use_dirty_rects(_on_)
+    #    repaint and push only changed regions when the view is still
+    # self.profiler.section(_name_)
+    #    with block timing _name_ for the profile overlay (F3) and CSV
 
     ##### IMPLEMENTATION #####
     ''' '''
-    def _redraw_all(self):
-        self.redraw_all()
-        pygame.display.flip()
+    def _timer_fired(self, time_passed):
+        with self.profiler.section("timer_fired"):
+            self.remember_state()
+            self.timer_fired(time_passed)
+        if self.recording is not None:
+            self.recording.step(time_passed, self.state_key)
+
+    def _redraw_all(self, alpha=1.0):
+        section = self.profiler.section
+        self.interpolate(alpha)
+        dirty = self.dirty
+        overlay = self.overlay if self.overlay.shown else None
+        if dirty is not None:
+            dirty.begin(self.view_key())
+            self.dirty_rects(dirty)
+            regions = dirty.regions()
+            if regions is not None:
+                with section("redraw_all"):
+                    for region in regions:
+                        self.screen.set_clip(region)
+                        self.redraw_all()
+                    self.screen.set_clip(None)
+                if overlay is not None:
+                    overlay.draw(self.screen)
+                    regions.append(overlay.rect)
+                with section("flip"):
+                    pygame.display.update(regions)
+                return
+        with section("redraw_all"):
+            self.redraw_all()
+        if overlay is not None: overlay.draw(self.screen)
+        with section("flip"):
+            pygame.display.flip()
+
+    def _end_frame(self):
+        self.profiler.end_frame(self.entity_counts())
+        self.overlay.update()
+
+    def toggle_overlay(self):
+        self.overlay.toggle()
+        if self.dirty is not None: self.dirty.invalidate()
+
+    def use_dirty_rects(self, on=True):
+        if on: self.dirty = DirtyTracker(self.screen.get_rect())
+        else: self.dirty = None
 
     def is_key_down(self, key):
         return self.key_dict.get(key, False)
@@ -41,33 +110,91 @@ class PygameGame(object):
         self.screen = pygame.display.set_mode(
             (self.screen_width, self.screen_height), 0, 32)
         self.bg_color = 0, 0, 0
+        self.dirty = None
+        self.profiler = FrameProfiler(self.profile_history)
+        self.overlay = ProfileOverlay(self.profiler, 1000.0 / (self.fps or 60))
         self.init()
 
     def _exit(self):
         self.exit()
+        if self.profile_csv: self.profiler.write_csv(self.profile_csv)
+        if self.record_path: self.recording.save(self.record_path)
         sys.exit()
 
     def _key_pressed(self, key):
+        if key == pygame.K_F3:
+            self.toggle_overlay()
+            return
+        if self.recording is not None: self.recording.key(True, key)
         self.key_dict[key] = True
         self.key_pressed(key)
 
     def _key_released(self, key):
+        if self.recording is not None: self.recording.key(False, key)
         self.key_dict[key] = False
         self.key_released(key)
 
-    def run(self, screen_width=600, screen_height=400, fps=30, title="Game"):
+    # fps caps rendering (0 for uncapped), the simulation always steps #
+    # sim_fps times a second of game time, running at most max_steps   #
+    # steps per rendered frame and dropping the rest when it falls     #
+    # behind. F3 shows the profile overlay, and with profile_csv the  #
+    # last frames' timings are written there on exit. With record the #
+    # seed, key events and steps are saved there on exit for replay   #
+    def run(self, screen_width=600, screen_height=400, fps=30, title="Game",
+            sim_fps=None, max_steps=5, profile_csv=None, record=None):
         pygame.init()
         pygame.display.set_caption(title)
         self.screen_width, self.screen_height = screen_width, screen_height
+        self.fps = fps
+        self.profile_csv = profile_csv
+        if record:
+            self.record_path = record
+            self.recording = Recording(
+                screen_size=(screen_width, screen_height))
+            random.seed(self.recording.seed)
         self._init()
+        step = 1.0 / (sim_fps or fps)
+        accumulator = 0.0
+        profiler = self.profiler
         while True:
-            time_passed = self.clock.tick(fps)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self._exit()
-                elif event.type == pygame.KEYDOWN:
-                    self._key_pressed(event.key)
-                elif event.type == pygame.KEYUP:
-                    self._key_released(event.key)
-            self.timer_fired(time_passed/1000.)
-            self._redraw_all()
+            accumulator += self.clock.tick(fps) / 1000.
+            profiler.begin_frame()
+            with profiler.section("events"):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        self._exit()
+                    elif event.type == pygame.KEYDOWN:
+                        self._key_pressed(event.key)
+                    elif event.type == pygame.KEYUP:
+                        self._key_released(event.key)
+            steps = 0
+            while accumulator >= step and steps < max_steps:
+                self._timer_fired(step)
+                accumulator -= step
+                steps += 1
+            if accumulator >= step: accumulator = 0.0
+            self._redraw_all(accumulator / step)
+            self._end_frame()
+
+    # steps through a recorded session as fast as possible, drawing #
+    # only if render; returns the steps whose state did not match    #
+    def replay(self, path, fps=30, title="Game", render=False):
+        recording = Recording.load(path)
+        pygame.init()
+        pygame.display.set_caption(title)
+        self.screen_width, self.screen_height = recording.screen_size
+        self.fps = fps
+        random.seed(recording.seed)
+        self._init()
+        replayer = Replayer(self, recording)
+        start = timer()
+        for i in xrange(len(replayer)):
+            self.profiler.begin_frame()
+            replayer.step(i)
+            if render: self._redraw_all()
+            self._end_frame()
+        elapsed = timer() - start
+        print "%d steps in %.2fs, %d checks, %d mismatched" % (
+            len(replayer), elapsed, len(replayer.checks),
+            len(replayer.mismatches))
+        return replayer.mismatches
@@ -0,0 +1,78 @@
+import random, json, zlib
+
+def checksum(state):
+    return zlib.crc32(repr(state)) & 0xffffffff
+
+class Recording(object):
+    ''' One play session: RNG seed, key events and simulation steps
+        key events are stored with the index of the step they came
+        before, and every check_every steps a checksum of the game state
+        is kept so a replay can tell where it drifted
+        '''
+    def __init__(self, seed=None, screen_size=(600, 400), check_every=30):
+        if seed is None: seed = random.getrandbits(32)
+        self.seed = seed
+        self.screen_size = tuple(screen_size)
+        self.check_every = check_every
+        # time_passed of each step, (step, down, key) and (step, sum) #
+        self.steps = []
+        self.events = []
+        self.checks = []
+
+    def key(self, down, key):
+        self.events.append((len(self.steps), down, key))
+
+    # state is called for the checksum only on steps that keep one #
+    def step(self, time_passed, state):
+        self.steps.append(time_passed)
+        if len(self.steps) % self.check_every == 0:
+            self.checks.append((len(self.steps), checksum(state())))
+
+    def events_by_step(self):
+        by_step = dict()
+        for step, down, key in self.events:
+            by_step.setdefault(step, []).append((down, key))
+        return by_step
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({"seed": self.seed, "screen_size": self.screen_size,
+                       "check_every": self.check_every,
+                       "steps": self.steps, "events": self.events,
+                       "checks": self.checks}, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        recording = cls(data["seed"], data["screen_size"],
+                        data["check_every"])
+        recording.steps = data["steps"]
+        recording.events = [tuple(event) for event in data["events"]]
+        recording.checks = [tuple(check) for check in data["checks"]]
+        return recording
+
+class Replayer(object):
+    ''' Feeds a recording's key events and step lengths to a game
+        the game must have been seeded with the recording's seed before
+        its init; mismatches lists the steps whose checksum differed
+        '''
+    def __init__(self, game, recording):
+        self.game = game
+        self.recording = recording
+        self.events = recording.events_by_step()
+        self.checks = dict(recording.checks)
+        self.mismatches = []
+
+    def __len__(self):
+        return len(self.recording.steps)
+
+    def step(self, i):
+        game = self.game
+        for down, key in self.events.get(i, ()):
+            if down: game._key_pressed(key)
+            else: game._key_released(key)
+        game._timer_fired(self.recording.steps[i])
+        expected = self.checks.get(i + 1)
+        if expected is not None and checksum(game.state_key()) != expected:
+            self.mismatches.append(i + 1)
@@ -0,0 +1,60 @@
+import pygame
+from collections import OrderedDict
+
+class RotationCache(object):
+    ''' Shared cache of rotated surfaces
+        angles are snapped to multiples of step degrees, entries are
+        keyed by (source surface, snapped angle) and evicted least
+        recently used first once max_bytes is exceeded
+        '''
+    def __init__(self, step=2, max_bytes=32*1024*1024):
+        self.step = step
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def quantize(self, angle):
+        steps = int(round(360.0 / self.step))
+        return int(round(angle / self.step)) % steps
+
+    def rotate(self, surface, angle):
+        q = self.quantize(angle)
+        if q == 0: return surface
+        key = (surface, q)
+        entries = self.entries
+        image = entries.pop(key, None)
+        if image is not None:
+            self.hits += 1
+            entries[key] = image
+            return image
+        self.misses += 1
+        image = pygame.transform.rotate(surface, q * self.step)
+        entries[key] = image
+        self.bytes += self.surface_bytes(image)
+        while self.bytes > self.max_bytes and len(entries) > 1:
+            old_key, old_image = entries.popitem(last=False)
+            self.bytes -= self.surface_bytes(old_image)
+        return image
+
+    def surface_bytes(self, surface):
+        w, h = surface.get_size()
+        return w * h * surface.get_bytesize()
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self.entries), "bytes": self.bytes}
+
+cache = RotationCache()
+
+def rotate(surface, angle):
+    return cache.rotate(surface, angle)
@@ -1,48 +1,87 @@
 import pygame.mixer, random
 import os
+import assets
+
+# higher priority sounds may cut off lower or equal priority voices #
+PRIORITIES = {"crunch": 2, "scream": 1}
+# shortest and longest wait before a type may play again, in seconds #
+RATE_LIMITS = {"scream": (0.25, 0.75), "crunch": (0.1, 0.1)}
 
 class SoundManager(object):
+    ''' Plays sounds on a fixed set of mixer channels
+        sounds are decoded once into the shared asset cache and grouped
+        by type (their folder under sounds/). When every channel is busy
+        the lowest priority, oldest voice is stolen, and a sound is
+        dropped if all voices outrank it. Types with a rate limit are
+        dropped until their wait has passed
+        '''
     initted = False
 
     @classmethod
     def init(cls):
         cls.initted = True
         cls.sounds = dict()
-        for sound_type in os.listdir("sounds"):
+        for sound_type in sorted(os.listdir("sounds")):
             cls.sounds[sound_type] = []
-            for sound in os.listdir(os.path.join("sounds", sound_type)):
-                sound_file = os.path.join("sounds",
-                                          os.path.join(sound_type, sound))
-                cls.sounds[sound_type].append(pygame.mixer.Sound(sound_file))
-        scream_count = 3
-        screams = ["sounds/scream/%d.wav" % i for i in xrange(scream_count)]
-        crunch_count = 3
-        crunches = ["sounds/crunch/%d.wav" % i for i in xrange(crunch_count)]
-        cls.screams = [pygame.mixer.Sound(scream) for scream in screams]
-        cls.crunches = [pygame.mixer.Sound(crunch) for crunch in crunches]
+            folder = os.path.join("sounds", sound_type)
+            for sound in sorted(os.listdir(folder)):
+                sound_file = os.path.join(folder, sound)
+                cls.sounds[sound_type].append(assets.sound(sound_file))
 
     def __init__(self):
         if not self.__class__.initted: self.__class__.init()
-        self.curr_channel = 0
         self.num_channels = pygame.mixer.get_num_channels()
         self.channels = [pygame.mixer.Channel(i)
                          for i in xrange(self.num_channels)]
+        # (priority, start time) of what each channel last played #
+        self.voices = [(0, 0.0)] * self.num_channels
+        self.time = 0.0
+        self.next_time = dict()
+        self.played = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    def update(self, time_passed):
+        self.time += time_passed
 
-    def play(self, sound):
-        channel = self.channels[self.curr_channel]
-        channel.play(sound)
-        self.curr_channel += 1
-        self.curr_channel %= self.num_channels
+    def free_voice(self, priority):
+        channels, voices = self.channels, self.voices
+        steal = None
+        for i in xrange(self.num_channels):
+            if not channels[i].get_busy(): return i
+            if voices[i][0] <= priority and (steal is None or
+                                             voices[i] < voices[steal]):
+                steal = i
+        if steal is not None: self.stolen += 1
+        return steal
 
-    def play_sound(self, filename):
-        path = os.path.join("sounds", filename)
-        print path
-        sound = pygame.mixer.Sound(path)
-        self.play(sound)
+    def play(self, sound, priority=0):
+        i = self.free_voice(priority)
+        if i is None:
+            self.dropped += 1
+            return False
+        self.channels[i].play(sound)
+        self.voices[i] = (priority, self.time)
+        self.played += 1
+        return True
+
+    def play_sound(self, filename, priority=0):
+        return self.play(assets.sound(os.path.join("sounds", filename)),
+                         priority)
 
     def play_sound_by_type(self, sound_type):
         if (sound_type not in SoundManager.sounds):
             raise Exception("Sound type %s not found" % sound_type)
-        else:
-            sound = random.choice(SoundManager.sounds[sound_type])
-            self.play(sound)
\ No newline at end of file
+        if self.time < self.next_time.get(sound_type, 0.0):
+            self.dropped += 1
+            return False
+        if sound_type in RATE_LIMITS:
+            shortest, longest = RATE_LIMITS[sound_type]
+            self.next_time[sound_type] = self.time + random.uniform(shortest,
+                                                                    longest)
+        sound = random.choice(SoundManager.sounds[sound_type])
+        return self.play(sound, PRIORITIES.get(sound_type, 0))
+
+    def stats(self):
+        return {"played": self.played, "stolen": self.stolen,
+                "dropped": self.dropped}
@@ -0,0 +1,239 @@
+import random
+import numpy as np
+import rotcache
+from vec2d import turn_table
+from worm import WormPiece
+
+# Python 2 round(): halves go away from zero #
+def round_away(values):
+    return np.where(values >= 0, np.floor(values + 0.5),
+                    np.ceil(values - 0.5))
+
+class WormSwarm(object):
+    ''' Every AI worm, stored as arrays and advanced all at once
+        piece 0 of a worm is its head, which turns on a timer and bounces
+        between top_y and bottom_y; pieces 1.. are links that follow the
+        piece in front of them the way WormLink does. Worms that go
+        dormant with their chunk of the world are taken out as packed rows
+        and put back when it wakes
+        '''
+    links = 5
+    link_dist = 5
+    fields = ('pos', 'old_pos', 'prev_pos', 'angle', 'velocity', 'turn',
+              'elapsed', 'change_time')
+    turn_speed = 5.0
+    radius = 25
+
+    @classmethod
+    def init(cls):
+        cache = rotcache.cache
+        cls.steps = int(round(360.0 / cache.step))
+        cls.images = [cache.rotate(WormPiece.ai_image, q * cache.step)
+                      for q in xrange(cls.steps)]
+        cls.sizes = np.array([image.get_size() for image in cls.images])
+        table = turn_table(cls.turn_speed)
+        cls.turn_sin = np.array([table[d][0] for d in (-1, 0, 1)])
+        cls.turn_cos = np.array([table[d][1] for d in (-1, 0, 1)])
+
+    def __init__(self, screen, camera, ground_y, capacity=64):
+        self.screen = screen
+        self.camera = camera
+        sw, sh = screen.get_size()
+        self.top_y, self.bottom_y = ground_y + 50, sh - 100
+        self.rng = np.random.RandomState(random.getrandbits(32))
+        self.count = 0
+        pieces = self.links + 1
+        self.pos = np.zeros((capacity, pieces, 2))
+        self.old_pos = np.zeros((capacity, pieces, 2))
+        self.prev_pos = np.zeros((capacity, pieces, 2))
+        self.angle = np.zeros((capacity, pieces))
+        self.velocity = np.zeros((capacity, 2))
+        self.turn = np.zeros(capacity, dtype=np.int32)
+        self.elapsed = np.zeros(capacity)
+        self.change_time = np.zeros(capacity)
+
+    def __len__(self):
+        return self.count
+
+    def grow(self, needed):
+        capacity = len(self.turn)
+        while capacity < needed: capacity *= 2
+        for name in self.fields:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, x, y):
+        i = self.count
+        if i == len(self.turn): self.grow(i + 1)
+        rng = self.rng
+        self.velocity[i] = (rng.random_sample()*0.5 + 0.25, 0)
+        self.turn[i] = rng.randint(-1, 2)
+        self.elapsed[i] = 0.0
+        self.change_time[i] = rng.random_sample()*2 + 0.5
+        self.pos[i, :, 0] = x - self.link_dist * np.arange(self.links + 1)
+        self.pos[i, :, 1] = y
+        self.old_pos[i] = self.pos[i]
+        self.prev_pos[i] = self.pos[i]
+        self.angle[i] = 0.0
+        self.count += 1
+        return i
+
+    # swaps the last worm into slot i #
+    def remove(self, i):
+        last = self.count - 1
+        if i != last:
+            for name in self.fields:
+                arr = getattr(self, name)
+                arr[i] = arr[last]
+        self.count = last
+
+    # removes the worms whose heads are outside left..right, returns #
+    # (head x, packed row) for each, one flat float array per worm   #
+    def take_outside(self, left, right):
+        n = self.count
+        head_x = self.pos[:n, 0, 0]
+        index = np.flatnonzero((head_x < left) | (head_x >= right))
+        if not len(index): return []
+        rows = np.hstack([getattr(self, name)[index].reshape(len(index), -1)
+                          for name in self.fields])
+        taken = zip(head_x[index].tolist(), rows)
+        for i in index[::-1].tolist():
+            self.remove(i)
+        return taken
+
+    # adds back a worm from a row packed by take_outside #
+    def put(self, row):
+        i = self.count
+        if i == len(self.turn): self.grow(i + 1)
+        start = 0
+        for name in self.fields:
+            arr = getattr(self, name)
+            size = int(np.prod(arr.shape[1:]))
+            arr[i] = row[start:start + size].reshape(arr.shape[1:])
+            start += size
+        self.count += 1
+        return i
+
+    def clear(self):
+        self.count = 0
+
+    def update(self, time_passed):
+        n = self.count
+        if n == 0: return
+        self.update_heads(n, time_passed)
+        # the head keeps no last position, so the first link is only #
+        # ever dragged along by the distance correction               #
+        self.old_pos[:n, 0] = self.pos[:n, 0]
+        for k in xrange(1, self.links + 1):
+            self.update_links(n, k)
+
+    def update_heads(self, n, time_passed):
+        elapsed = self.elapsed[:n]
+        elapsed += time_passed
+        due = np.flatnonzero(elapsed >= self.change_time[:n])
+        if len(due):
+            rng = self.rng
+            self.change_time[due] = rng.random_sample(len(due))*2 + 0.5
+            # one of the two other directions, picked evenly #
+            turn = self.turn[due] + 1 + rng.randint(1, 3, len(due))
+            self.turn[due] = turn % 3 - 1
+            elapsed[due] = 0.0
+        turn = self.turn[:n] + 1
+        sin, cos = self.turn_sin[turn], self.turn_cos[turn]
+        velocity = self.velocity[:n]
+        vx, vy = velocity[:, 0].copy(), velocity[:, 1].copy()
+        velocity[:, 0] = vx*cos - vy*sin
+        velocity[:, 1] = vx*sin + vy*cos
+        head = self.pos[:n, 0]
+        head += velocity
+        vy = velocity[:, 1]
+        high = head[:, 1] < self.top_y
+        vy[high] = np.abs(vy[high])
+        low = head[:, 1] > self.bottom_y
+        vy[low] = -np.abs(vy[low])
+        self.angle[:n, 0] = np.degrees(np.arctan2(vy, velocity[:, 0]))
+
+    # link k of every worm, following piece k-1 as WormLink.update_pos #
+    def update_links(self, n, k):
+        pos = self.pos[:n, k]
+        self.old_pos[:n, k] = pos
+        prev_pos, prev_old = self.pos[:n, k-1], self.old_pos[:n, k-1]
+        v1 = prev_old - pos
+        v2 = prev_pos - pos
+        v1l = np.sqrt((v1*v1).sum(axis=1))
+        v2l = np.sqrt((v2*v2).sum(axis=1))
+        v1a = np.degrees(np.arctan2(v1[:, 1], v1[:, 0]))
+        v2a = np.degrees(np.arctan2(v2[:, 1], v2[:, 0]))
+        v1a[v1l == 0] = 0
+        v2a[v2l == 0] = 0
+        v1a[(v1a < -90) & (v2a > 90)] += 360
+        v1weight, v2weight = 500, 1
+        angle = np.radians((v1weight*v1a*v1l + v2weight*v2a*v2l)/
+                           (v1weight*v1l + v2weight*v2l))
+        step = prev_pos - prev_old
+        length = np.sqrt((step*step).sum(axis=1))
+        pos[:, 0] += length*np.cos(angle)
+        pos[:, 1] += length*np.sin(angle)
+        # correct the distance to the piece in front #
+        sep = pos - prev_pos
+        scale = self.link_dist / np.sqrt((sep*sep).sum(axis=1))
+        pos[:] = prev_pos + sep*scale[:, None]
+        ahead = prev_pos - pos
+        self.angle[:n, k] = np.degrees(np.arctan2(ahead[:, 1], ahead[:, 0]))
+
+    # (worm index, squared distance) of worms whose heads are in radius #
+    def near(self, pos, radius):
+        n = self.count
+        heads = self.pos[:n, 0]
+        dx = heads[:, 0] - pos[0]
+        dy = heads[:, 1] - pos[1]
+        dist_sqrd = dx*dx + dy*dy
+        index = np.flatnonzero(dist_sqrd < radius*radius)
+        return zip(index.tolist(), dist_sqrd[index].tolist())
+
+    def remember_pos(self):
+        self.prev_pos[:self.count] = self.pos[:self.count]
+
+    # image index, world rects where they are drawn this frame and    #
+    # screen rects of every piece, tail first per worm                #
+    def screen_rects(self):
+        n = self.count
+        camera = self.camera
+        pos = self.pos[:n, ::-1].reshape(-1, 2)
+        prev = self.prev_pos[:n, ::-1].reshape(-1, 2)
+        angle = self.angle[:n, ::-1].reshape(-1)
+        frames = round_away(-angle / rotcache.cache.step).astype(int)
+        frames %= self.steps
+        sizes = self.sizes[frames]
+        world = np.trunc(pos - sizes // 2)
+        offset = (prev - pos) * (1.0 - camera.alpha)
+        jumped = ((np.abs(offset[:, 0]) > camera.width) |
+                  (np.abs(offset[:, 1]) > camera.height))
+        offset[jumped] = 0
+        screen = world + np.trunc(offset - (camera.draw_pos.x,
+                                            camera.draw_pos.y))
+        return (frames, np.hstack((world + offset, sizes)),
+                np.hstack((screen, sizes)))
+
+    def mark_dirty(self, tracker):
+        if not self.count: return
+        frames, world, screen = self.screen_rects()
+        pieces = self.links + 1
+        screen = screen.reshape(self.count, pieces, 4)
+        lefts = screen[:, :, 0].min(axis=1).tolist()
+        tops = screen[:, :, 1].min(axis=1).tolist()
+        rights = (screen[:, :, 0] + screen[:, :, 2]).max(axis=1).tolist()
+        bottoms = (screen[:, :, 1] + screen[:, :, 3]).max(axis=1).tolist()
+        for left, top, right, bottom in zip(lefts, tops, rights, bottoms):
+            tracker.add_bounds(int(left), int(top), int(right), int(bottom))
+
+    def blit_me(self):
+        if not self.count: return
+        frames, world, screen = self.screen_rects()
+        shown = np.flatnonzero(self.camera.rects_on_screen(world))
+        images, blit = self.images, self.screen.blit
+        for frame, (x, y) in zip(frames[shown].tolist(),
+                                 screen[shown, :2].astype(int).tolist()):
+            blit(images[frame], (x, y))
@@ -1,10 +1,31 @@
 import pygame
+from collections import OrderedDict
 
 class FontManager(pygame.font.Font):
-    def __init__(self, font_name, size):
+    ''' Font that keeps the surfaces of recently written strings
+        rendered lines are kept in an LRU keyed by text, colour and
+        antialiasing, so text that does not change is only rendered once
+        '''
+    def __init__(self, font_name, size, max_entries=64):
         font_path = pygame.font.match_font(font_name)
         super(FontManager, self).__init__(font_path, size)
         self.height = self.get_height()
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render_cached(self, text, color, antialias=True):
+        key = (text, tuple(color), antialias)
+        surface = self.cache.pop(key, None)
+        if surface is None:
+            self.misses += 1
+            surface = self.render(text, antialias, color)
+            if len(self.cache) >= self.max_entries:
+                self.cache.popitem(last=False)
+        else: self.hits += 1
+        self.cache[key] = surface
+        return surface
 
     def write(self, screen, x, y, text, color=(0, 0, 0)):
         for i, line in enumerate(text.split('\n')):
@@ -12,7 +33,8 @@ class FontManager(pygame.font.Font):
             self.write_line(screen, x, y+dy, line, color)
 
     def write_line(self, screen, x, y, text, color):
-        line_surf = self.render(text, True, color)
-        size = self.size(text)
-        text_rect = pygame.Rect(x, y, *size)
-        screen.blit(line_surf, text_rect)
\ No newline at end of file
+        screen.blit(self.render_cached(text, color), (x, y))
+
+    def stats(self):
+        return {"entries": len(self.cache), "hits": self.hits,
+                "misses": self.misses}
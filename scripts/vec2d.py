@@ -1,7 +1,9 @@
 ########################################################################
 import operator
 import math
- 
+
+NUMBER_TYPES = (int, float, long)
+
 class vec2d(object):
     """2d vector class, supports vector and scalar operators,
        and also provides a bunch of high level functions
@@ -9,7 +11,7 @@ class vec2d(object):
     __slots__ = ['x', 'y']
  
     def __init__(self, x_or_pair, y = None):
-        if y == None:
+        if y is None:
             self.x = x_or_pair[0]
             self.y = x_or_pair[1]
         else:
@@ -41,12 +43,16 @@ class vec2d(object):
     
     # Comparison
     def __eq__(self, other):
+        if type(other) is vec2d:
+            return self.x == other.x and self.y == other.y
         if hasattr(other, "__getitem__") and len(other) == 2:
             return self.x == other[0] and self.y == other[1]
         else:
             return False
     
     def __ne__(self, other):
+        if type(other) is vec2d:
+            return self.x != other.x or self.y != other.y
         if hasattr(other, "__getitem__") and len(other) == 2:
             return self.x != other[0] or self.y != other[1]
         else:
@@ -55,12 +61,16 @@ class vec2d(object):
     def __nonzero__(self):
         return self.x or self.y
  
-    # Generic operator handlers
+    # Generic operator handlers, used by the less common operators.    #
+    # The hot ones below test vec2d, then plain numbers, then sequences #
     def _o2(self, other, f):
         "Any two-operator operation where the left operand is a vec2d"
         if isinstance(other, vec2d):
             return vec2d(f(self.x, other.x),
                          f(self.y, other.y))
+        elif isinstance(other, NUMBER_TYPES):
+            return vec2d(f(self.x, other),
+                         f(self.y, other))
         elif (hasattr(other, "__getitem__")):
             return vec2d(f(self.x, other[0]),
                          f(self.y, other[1]))
@@ -70,7 +80,10 @@ class vec2d(object):
  
     def _r_o2(self, other, f):
         "Any two-operator operation where the right operand is a vec2d"
-        if (hasattr(other, "__getitem__")):
+        if isinstance(other, NUMBER_TYPES):
+            return vec2d(f(other, self.x),
+                         f(other, self.y))
+        elif (hasattr(other, "__getitem__")):
             return vec2d(f(other[0], self.x),
                          f(other[1], self.y))
         else:
@@ -79,7 +92,10 @@ class vec2d(object):
  
     def _io(self, other, f):
         "inplace operator"
-        if (hasattr(other, "__getitem__")):
+        if isinstance(other, NUMBER_TYPES):
+            self.x = f(self.x, other)
+            self.y = f(self.y, other)
+        elif (hasattr(other, "__getitem__")):
             self.x = f(self.x, other[0])
             self.y = f(self.y, other[1])
         else:
@@ -89,8 +105,10 @@ class vec2d(object):
  
     # Addition
     def __add__(self, other):
-        if isinstance(other, vec2d):
+        if type(other) is vec2d:
             return vec2d(self.x + other.x, self.y + other.y)
+        elif isinstance(other, NUMBER_TYPES):
+            return vec2d(self.x + other, self.y + other)
         elif hasattr(other, "__getitem__"):
             return vec2d(self.x + other[0], self.y + other[1])
         else:
@@ -98,9 +116,12 @@ class vec2d(object):
     __radd__ = __add__
     
     def __iadd__(self, other):
-        if isinstance(other, vec2d):
+        if type(other) is vec2d:
             self.x += other.x
             self.y += other.y
+        elif isinstance(other, NUMBER_TYPES):
+            self.x += other
+            self.y += other
         elif hasattr(other, "__getitem__"):
             self.x += other[0]
             self.y += other[1]
@@ -111,23 +132,28 @@ class vec2d(object):
  
     # Subtraction
     def __sub__(self, other):
-        if isinstance(other, vec2d):
+        if type(other) is vec2d:
             return vec2d(self.x - other.x, self.y - other.y)
+        elif isinstance(other, NUMBER_TYPES):
+            return vec2d(self.x - other, self.y - other)
         elif (hasattr(other, "__getitem__")):
             return vec2d(self.x - other[0], self.y - other[1])
         else:
             return vec2d(self.x - other, self.y - other)
     def __rsub__(self, other):
-        if isinstance(other, vec2d):
-            return vec2d(other.x - self.x, other.y - self.y)
+        if isinstance(other, NUMBER_TYPES):
+            return vec2d(other - self.x, other - self.y)
         if (hasattr(other, "__getitem__")):
             return vec2d(other[0] - self.x, other[1] - self.y)
         else:
             return vec2d(other - self.x, other - self.y)
     def __isub__(self, other):
-        if isinstance(other, vec2d):
+        if type(other) is vec2d:
             self.x -= other.x
             self.y -= other.y
+        elif isinstance(other, NUMBER_TYPES):
+            self.x -= other
+            self.y -= other
         elif (hasattr(other, "__getitem__")):
             self.x -= other[0]
             self.y -= other[1]
@@ -138,7 +164,9 @@ class vec2d(object):
  
     # Multiplication
     def __mul__(self, other):
-        if isinstance(other, vec2d):
+        if isinstance(other, NUMBER_TYPES):
+            return vec2d(self.x*other, self.y*other)
+        if type(other) is vec2d:
             return vec2d(self.x*other.x, self.y*other.y)
         if (hasattr(other, "__getitem__")):
             return vec2d(self.x*other[0], self.y*other[1])
@@ -147,7 +175,10 @@ class vec2d(object):
     __rmul__ = __mul__
     
     def __imul__(self, other):
-        if isinstance(other, vec2d):
+        if isinstance(other, NUMBER_TYPES):
+            self.x *= other
+            self.y *= other
+        elif type(other) is vec2d:
             self.x *= other.x
             self.y *= other.y
         elif (hasattr(other, "__getitem__")):
@@ -160,10 +191,16 @@ class vec2d(object):
  
     # Division
     def __div__(self, other):
+        if isinstance(other, NUMBER_TYPES):
+            return vec2d(self.x / other, self.y / other)
         return self._o2(other, operator.div)
     def __rdiv__(self, other):
         return self._r_o2(other, operator.div)
     def __idiv__(self, other):
+        if isinstance(other, NUMBER_TYPES):
+            self.x /= other
+            self.y /= other
+            return self
         return self._io(other, operator.div)
  
     def __floordiv__(self, other):
@@ -178,7 +215,7 @@ class vec2d(object):
     def __rtruediv__(self, other):
         return self._r_o2(other, operator.truediv)
     def __itruediv__(self, other):
-        return self._io(other, operator.floordiv)
+        return self._io(other, operator.truediv)
  
     # Modulo
     def __mod__(self, other):
@@ -222,10 +259,10 @@ class vec2d(object):
  
     # Unary operations
     def __neg__(self):
-        return vec2d(operator.neg(self.x), operator.neg(self.y))
+        return vec2d(-self.x, -self.y)
  
     def __pos__(self):
-        return vec2d(operator.pos(self.x), operator.pos(self.y))
+        return vec2d(+self.x, +self.y)
  
     def __abs__(self):
         return vec2d(abs(self.x), abs(self.y))
@@ -233,12 +270,24 @@ class vec2d(object):
     def __invert__(self):
         return vec2d(-self.x, -self.y)
  
+    # in place, allocation free updates for hot loops #
+    def add_scaled(self, other, scale):
+        self.x += other[0]*scale
+        self.y += other[1]*scale
+        return self
+
+    def rotate_by_sincos(self, sin, cos):
+        x, y = self.x, self.y
+        self.x = x*cos - y*sin
+        self.y = x*sin + y*cos
+        return self
+
     # vectory functions
     def get_length_sqrd(self): 
-        return self.x**2 + self.y**2
+        return self.x*self.x + self.y*self.y
  
     def get_length(self):
-        return math.sqrt(self.x**2 + self.y**2)    
+        return math.sqrt(self.x*self.x + self.y*self.y)
     def __setlength(self, value):
         length = self.get_length()
         self.x *= value/length
@@ -246,12 +295,7 @@ class vec2d(object):
     length = property(get_length, __setlength, None, "gets or sets the magnitude of the vector")
        
     def rotate(self, angle_degrees):
-        try:
-            float(angle_degrees)
-        except:
-            print angle_degrees, type(angle_degrees)
-            assert(False)
-        radians = math.radians(float(angle_degrees))
+        radians = math.radians(angle_degrees)
         cos = math.cos(radians)
         sin = math.sin(radians)
         x = self.x*cos - self.y*sin
@@ -268,9 +312,10 @@ class vec2d(object):
         return vec2d(x, y)
     
     def get_angle(self):
-        if (self.get_length_sqrd() == 0):
+        x, y = self.x, self.y
+        if x == 0 and y == 0:
             return 0
-        return math.degrees(math.atan2(self.y, self.x))
+        return math.degrees(math.atan2(y, x))
     def __setangle(self, angle_degrees):
         self.x = self.length
         self.y = 0
@@ -283,10 +328,11 @@ class vec2d(object):
         return math.degrees(math.atan2(cross, dot))
             
     def normalized(self):
-        length = self.length
+        x, y = self.x, self.y
+        length = math.sqrt(x*x + y*y)
         if length != 0:
-            return self/length
-        return vec2d(self)
+            return vec2d(x/length, y/length)
+        return vec2d(x, y)
  
     def normalize_return_length(self):
         length = self.length
@@ -333,6 +379,19 @@ class vec2d(object):
     def __setstate__(self, dict):
         self.x, self.y = dict
         
+# (sin, cos) for turning -step, 0 and +step degrees, by turn direction #
+turn_tables = dict()
+
+def turn_table(step_degrees):
+    table = turn_tables.get(step_degrees)
+    if table is None:
+        table = dict()
+        for direction in (-1, 0, 1):
+            radians = math.radians(direction * step_degrees)
+            table[direction] = (math.sin(radians), math.cos(radians))
+        turn_tables[step_degrees] = table
+    return table
+
 ########################################################################
 ## Unit Testing                                                       ##
 ########################################################################
@@ -410,6 +469,17 @@ if __name__ == "__main__":
             angle = v.get_angle_between(v2)
             self.assertAlmostEquals(v.get_angle_between(v2), 0)  
  
+        def testInplaceFast(self):
+            v = vec2d(1, 2)
+            ref = v
+            v.add_scaled(vec2d(3, -1), 2)
+            self.assertEqual(v, (7, 0))
+            sin, cos = turn_table(90)[1]
+            v.rotate_by_sincos(sin, cos)
+            self.assert_(ref is v)
+            self.assert_((v - vec2d(7, 0).rotated(90)).length < .00001)
+            self.assertEqual(turn_table(90)[0], (0.0, 1.0))
+
         def testHighLevel(self):
             basis0 = vec2d(5.0, 0)
             basis1 = vec2d(0, .5)
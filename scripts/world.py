@@ -0,0 +1,116 @@
+import random, math
+import enemies
+from swarm import WormSwarm
+
+class ChunkedWorld(object):
+    ''' The level as x-chunks of chunk_width, simulated near the camera
+        only the chunks within radius of the camera's chunk are active.
+        A chunk is generated the first time it becomes active; whatever
+        ends up outside the active chunks is stored as compact records
+        in the dormant chunk it is in, and handed back to activate_chunk
+        when that chunk wakes again
+        '''
+    ##### INTERFACE #####
+
+    ''' Override these functions '''
+    # fill a chunk that was never active, x from left to right #
+    def generate_chunk(self, chunk, left, right): pass
+    # bring back the records a chunk held while dormant #
+    def activate_chunk(self, chunk, records): pass
+    # take out everything outside left..right as (x, record) pairs #
+    def deactivate_outside(self, left, right): return []
+
+    ##### IMPLEMENTATION #####
+    def __init__(self, chunk_width, radius=2):
+        self.chunk_width = chunk_width
+        self.radius = radius
+        self.dormant = dict()
+        self.dormant_count = 0
+        self.generated = set()
+        self.active = None
+
+    def chunk_of(self, x):
+        return int(math.floor(1.0 * x / self.chunk_width))
+
+    # first and last active chunk with the camera centred on x #
+    def window(self, x):
+        chunk = self.chunk_of(x)
+        return chunk - self.radius, chunk + self.radius
+
+    # the chunks around x count as generated, for a level start that #
+    # is populated already                                            #
+    def start(self, x):
+        first, last = self.window(x)
+        self.generated.update(xrange(first, last + 1))
+
+    def update(self, x):
+        first, last = self.window(x)
+        old = self.active
+        self.active = first, last
+        for chunk in xrange(first, last + 1):
+            if old is not None and old[0] <= chunk <= old[1]: continue
+            left = chunk * self.chunk_width
+            if chunk not in self.generated:
+                self.generated.add(chunk)
+                self.generate_chunk(chunk, left, left + self.chunk_width)
+            records = self.dormant.pop(chunk, None)
+            if records:
+                self.dormant_count -= len(records)
+                self.activate_chunk(chunk, records)
+        width = self.chunk_width
+        for x, record in self.deactivate_outside(first * width,
+                                                 (last + 1) * width):
+            self.dormant.setdefault(self.chunk_of(x), []).append(record)
+            self.dormant_count += 1
+
+class LevelWorld(ChunkedWorld):
+    ''' KillerWorms2's world: enemies and AI worms sleep with their chunk
+        enemies are kept as (type, dormant_state()) and AI worms as
+        (WormSwarm, packed row); fresh chunks get a random population
+        between the bounds in population
+        '''
+    population = ((enemies.Megaman, (2, 4)), (enemies.Samus, (0, 2)),
+                  (enemies.Warthog, (0, 1)))
+    ai_worms = (1, 3)
+
+    def __init__(self, game, radius=2):
+        super(LevelWorld, self).__init__(game.cam.width, radius)
+        self.game = game
+        self.dormant_enemies = 0
+
+    def generate_chunk(self, chunk, left, right):
+        game = self.game
+        for enemy_type, (low, high) in self.population:
+            for _ in xrange(random.randint(low, high)):
+                pos = (random.randint(left, right - 1),
+                       game.ground_y - enemy_type.y_sep)
+                game.add_enemy(enemy_type.create(
+                    game.screen, game.cam, pos, random.choice(["l", "r"]),
+                    game.bullets))
+        for _ in xrange(random.randint(*self.ai_worms)):
+            game.worms.spawn(random.randint(left, right - 1),
+                             random.randint(game.ground_y + 50,
+                                            game.screen_height - 100))
+
+    def activate_chunk(self, chunk, records):
+        game = self.game
+        for kind, state in records:
+            if kind is WormSwarm:
+                game.worms.put(state)
+                continue
+            game.add_enemy(kind.from_dormant(game.screen, game.cam,
+                                             game.bullets, state))
+            self.dormant_enemies -= 1
+
+    # dying enemies are dropped rather than kept #
+    def deactivate_outside(self, left, right):
+        game = self.game
+        taken = []
+        for enemy in game.enemy_index.outside(left, right):
+            game.remove_enemy(enemy)
+            if enemy.dead: continue
+            taken.append((enemy.pos.x, (type(enemy), enemy.dormant_state())))
+            self.dormant_enemies += 1
+        for x, row in game.worms.take_outside(left, right):
+            taken.append((x, (WormSwarm, row)))
+        return taken
@@ -1,11 +1,15 @@
 import pygame, math, random
-from vec2d import vec2d
+import numpy as np
+from vec2d import vec2d, turn_table
+import rotcache
+import assets
+from entities import EntityStore
 
 class WormPiece(pygame.sprite.Sprite):
     @classmethod
     def init(cls):
-        cls.player_image = pygame.image.load('images/worm/worm_piece.png').convert_alpha()
-        cls.ai_image = pygame.image.load('images/ai_piece.png').convert_alpha()
+        cls.player_image = assets.image('images/worm/worm_piece.png').convert_alpha()
+        cls.ai_image = assets.image('images/ai_piece.png').convert_alpha()
 
     def __init__(self, screen, pos, camera, is_AI=False):
         pygame.sprite.Sprite.__init__(self)
@@ -16,6 +20,7 @@ class WormPiece(pygame.sprite.Sprite):
         self.image = self.base_image
         self.pos = pos
         self.old_pos = pos
+        self.prev_pos = (pos.x, pos.y)
         self.get_rect()
         self.direction = vec2d(1, 0)
         self.radius = 25
@@ -27,40 +32,29 @@ class WormPiece(pygame.sprite.Sprite):
                                                self.pos.y - self.image_h/2)
 
     def update(self):
-        self.image = pygame.transform.rotate(self.base_image,
-                                             -self.direction.angle)
+        self.image = rotcache.rotate(self.base_image, -self.direction.angle)
         self.get_rect()
 
-    def blit_me(self):
-        if self.camera.rect_on_screen(self.rect):
-            draw_rect = self.camera.rect_world_to_screen(self.rect)
-            self.screen.blit(self.image, draw_rect)
-
-class AIWormHead(WormPiece):
-    def __init__(self, screen, pos, top_y, bottom_y, camera):
-        super(AIWormHead, self).__init__(screen, pos, camera, True)
-        self.speed = random.random()*0.5 + 0.25
-        self.velocity = vec2d(self.speed, 0)
-        self.turn_speed = 5.0
-        self.top_y, self.bottom_y = top_y, bottom_y
-        self.elapsed = 0.0
-        self.change_time = random.random()*2 + 0.5
-        self.turn_direction = random.choice([-1, 1, 0])
+    def remember_pos(self):
+        self.prev_pos = (self.pos.x, self.pos.y)
 
-    def update(self, time_passed):
-        self.elapsed += time_passed
-        if self.elapsed >= self.change_time:
-            self.change_time = random.random()*2 + 0.5
-            new_dir = random.choice([-1, 1, 0])
-            while new_dir == self.turn_direction:
-                new_dir = random.choice([-1, 1, 0])
-            self.turn_direction = new_dir
-        self.velocity.rotate(self.turn_direction * self.turn_speed)
-        self.pos += self.velocity
-        if self.pos.y < self.top_y: self.velocity.y = abs(self.velocity.y)
-        if self.pos.y > self.bottom_y: self.velocity.y = -abs(self.velocity.y)
-        self.direction = self.velocity.normalized()
-        super(AIWormHead, self).update()
+    def mark_dirty(self, tracker):
+        camera = self.camera
+        offset = camera.lerp_offset(self.prev_pos, self.pos)
+        tracker.add(camera.rect_world_to_screen(self.rect, offset))
+
+    # rect moved to where blit_me draws it this frame, for camera.cull #
+    def draw_bounds(self):
+        dx, dy = self.camera.lerp_offset(self.prev_pos, self.pos)
+        rect = self.rect
+        return (rect.x + dx, rect.y + dy, rect.width, rect.height)
+
+    # drawn unconditionally, the owner culls with camera.cull #
+    def blit_me(self):
+        camera = self.camera
+        offset = camera.lerp_offset(self.prev_pos, self.pos)
+        draw_rect = camera.rect_world_to_screen(self.rect, offset)
+        self.screen.blit(self.image, draw_rect)
 
 class WormHead(WormPiece):
     def __init__(self, screen, pos, key_dict, ground_y, camera):
@@ -70,6 +64,9 @@ class WormHead(WormPiece):
         self.velocity = vec2d(self.avg_speed, 0)
         self.turn_speed = 10
         self.fly_turn_ratio = 0.5
+        # the camera holds still while the head is this close to the #
+        # centre of the view                                          #
+        self.camera_slack = camera.width / 10
         self.key_dict = key_dict
         self.ground_y = ground_y
 
@@ -86,7 +83,9 @@ class WormHead(WormPiece):
         else: assert(False)
         turn_speed = (self.turn_speed *
                       (1 if self.in_ground() else self.fly_turn_ratio))
-        self.velocity.rotate(turn_speed * turn_direction)
+        if turn_direction:
+            sin, cos = turn_table(turn_speed)[turn_direction]
+            self.velocity.rotate_by_sincos(sin, cos)
         if self.in_ground():
             self.velocity.length += (velocity-self.velocity.length)/10.0
         else:
@@ -94,8 +93,11 @@ class WormHead(WormPiece):
             self.velocity.x *= 0.99
         self.direction = self.velocity.normalized()
         self.pos += self.velocity
-        self.camera.pos.x += ((self.pos.x - self.camera.width/2 -
-                                    self.camera.pos.x) / 20.0)
+        offset = self.pos.x - self.camera.width/2 - self.camera.pos.x
+        if abs(offset) > self.camera_slack:
+            offset -= math.copysign(self.camera_slack, offset)
+            # the last pixel is covered at once instead of eased forever #
+            self.camera.pos.x += offset if abs(offset) < 1 else offset / 20.0
         if (self.pos.y > self.screen_height - self.radius):
             self.pos.y = self.screen_height - self.radius
             self.velocity.y *= 0
@@ -106,7 +108,7 @@ class Fangs(pygame.sprite.Sprite):
         pygame.sprite.Sprite.__init__(self)
         self.screen = screen
         self.screen_width, sh = self.screen.get_size()
-        self.base_image_top = pygame.image.load(filename).convert_alpha()
+        self.base_image_top = assets.image(filename).convert_alpha()
         self.base_image_bottom = pygame.transform.flip(self.base_image_top,
                                                        False, True)
         self.pos_angle = 60
@@ -138,10 +140,10 @@ class Fangs(pygame.sprite.Sprite):
 
     def update_images(self):
         base_angle = self.head.direction.angle
-        self.image_top = pygame.transform.rotate(self.base_image_top,
-                                                -(base_angle-self.fang_angle))
-        self.image_bot = pygame.transform.rotate(self.base_image_bottom,
-                                                -(base_angle+self.fang_angle))
+        self.image_top = rotcache.rotate(self.base_image_top,
+                                         -(base_angle-self.fang_angle))
+        self.image_bot = rotcache.rotate(self.base_image_bottom,
+                                         -(base_angle+self.fang_angle))
         self.get_rect()
 
     def get_rect(self):
@@ -154,15 +156,24 @@ class Fangs(pygame.sprite.Sprite):
         self.rect = union.move(self.pos.x - union_width/2,
                                self.pos.y - union_height/2)
 
-    def blit_me(self):
+    def draw_rects(self):
         top_pos = self.top_rect.move(
             self.top_pos.x - self.top_width/2,
             self.top_pos.y - self.top_height/2)
         bot_pos = self.bot_rect.move(
             self.bot_pos.x - self.bot_width/2,
             self.bot_pos.y - self.bot_height/2)
-        top_rect = self.camera.rect_world_to_screen(top_pos)
-        bot_rect = self.camera.rect_world_to_screen(bot_pos)
+        offset = self.camera.lerp_offset(self.head.prev_pos, self.head.pos)
+        return (self.camera.rect_world_to_screen(top_pos, offset),
+                self.camera.rect_world_to_screen(bot_pos, offset))
+
+    def mark_dirty(self, tracker):
+        top_rect, bot_rect = self.draw_rects()
+        tracker.add(top_rect)
+        tracker.add(bot_rect)
+
+    def blit_me(self):
+        top_rect, bot_rect = self.draw_rects()
         self.screen.blit(self.image_top, top_rect)
         self.screen.blit(self.image_bot, bot_rect)
 
@@ -179,60 +190,36 @@ class WormLink(WormPiece):
         self.direction = (self.prev_piece.pos - self.pos).normalized()
         super(WormLink, self).update()
 
+    # works on plain floats, this runs for every link of every worm #
     def update_pos(self):
-        v1 = self.prev_piece.old_pos - self.pos
-        v2 = self.prev_piece.pos - self.pos
+        pos, prev = self.pos, self.prev_piece
+        prev_pos, prev_old = prev.pos, prev.old_pos
+        v1x, v1y = prev_old.x - pos.x, prev_old.y - pos.y
+        v2x, v2y = prev_pos.x - pos.x, prev_pos.y - pos.y
         v1weight = 500
         v2weight = 1
-        v1a = v1.angle
-        v2a = v2.angle
+        v1a = math.degrees(math.atan2(v1y, v1x)) if v1x or v1y else 0
+        v2a = math.degrees(math.atan2(v2y, v2x)) if v2x or v2y else 0
+        v1l = math.sqrt(v1x*v1x + v1y*v1y)
+        v2l = math.sqrt(v2x*v2x + v2y*v2y)
         if v1a < -90 and v2a > 90: v1a += 360
-        angle = ((v1weight*v1a*v1.length + v2weight*v2a*v2.length)/
-                 (v1weight*v1.length+v2weight*v2.length))
-        length = (self.prev_piece.pos-self.prev_piece.old_pos).length
-        velocity = vec2d(length, 0)
-        velocity.angle = angle
-        self.pos += velocity
+        angle = ((v1weight*v1a*v1l + v2weight*v2a*v2l)/
+                 (v1weight*v1l+v2weight*v2l))
+        length = prev_pos.get_distance(prev_old)
+        radians = math.radians(angle)
+        pos.x += length*math.cos(radians)
+        pos.y += length*math.sin(radians)
         self.correct_distance()
 
     def correct_distance(self):
-        v1 = self.pos - self.prev_piece.pos
-        v1.length = self.distance_from_prev
-        self.pos = self.prev_piece.pos + v1
-
-class AIWorm(object):
-    def __init__(self, screen, pos, ground_y, camera):
-        self.screen = screen
-        sw, sh = screen.get_size()
-        self.head = AIWormHead(screen, pos, ground_y+50, sh-100, camera)
-        self.pos = vec2d(pos)
-        dist = 5
-        self.dist = dist
-        self.links = [WormLink(self.screen, self.head, dist, camera, True)]
-        for i in xrange(1, 5):
-            self.links.append(WormLink(self.screen, self.links[i-1], dist,
-                                       camera, True))
-        self.camera = camera
+        prev_pos = self.prev_piece.pos
+        dx, dy = self.pos.x - prev_pos.x, self.pos.y - prev_pos.y
+        scale = self.distance_from_prev/math.sqrt(dx*dx + dy*dy)
+        self.pos = vec2d(prev_pos.x + dx*scale, prev_pos.y + dy*scale)
 
-    def update(self, time_passed, main_worm):
-        self.head.update(time_passed)
-        self.pos = self.head.pos
-        add_w = 0
-        if self.pos.x < main_worm.pos.x - 2*self.camera.width:
-            self.pos.x += 4*self.camera.width
-            add_w = 4*self.camera.width
-        elif self.pos.x > main_worm.pos.x + 2*self.camera.width:
-            self.pos.x -= 4*self.camera.width
-            add_w = -4*self.camera.width
-        for link in self.links:
-            link.pos.x += add_w
-            link.update(time_passed)
-        return (main_worm.pos - self.pos).length
-
-    def blit_me(self):
-        for link in reversed(self.links):
-            link.blit_me()
-        self.head.blit_me()
+def fade_dirt(dirt):
+    dirt[2] *= 0.95
+    return dirt[2] <= 2
 
 class Worm(object):
     @classmethod
@@ -253,7 +240,7 @@ class Worm(object):
         self.ground_y = ground_y
         self.fangs = Fangs(self.screen, self.head,
                            'images/worm/worm_small_fang.png', camera)
-        self.dirt_list = []
+        self.dirt_list = EntityStore()
         self.dirt_duration = 50
         self.dirt_colors = [(38, 18, 6), (30, 15, 7), (40, 20, 10),
                             (12, 6, 3), (16, 8, 4)]
@@ -265,8 +252,13 @@ class Worm(object):
         return self.head.pos.y > self.ground_y
 
     def new_dirt(self, pos):
-        self.dirt_list.append([pos, random.choice(self.dirt_colors), 
-                                    self.dirt_duration])
+        self.dirt_list.add([pos, random.choice(self.dirt_colors),
+                            self.dirt_duration])
+
+    def remember_pos(self):
+        self.head.remember_pos()
+        for link in self.links:
+            link.remember_pos()
 
     def new_link(self):
         self.links.append(WormLink(self.screen, self.links[-1], self.dist,
@@ -275,35 +267,51 @@ class Worm(object):
         self.head.update(time_passed)
         self.pos = vec2d(self.head.pos)
         self.fangs.update()
-        dirt_count = len(self.dirt_list)
-        i = 0
         self.health -= 0.1
-        while i < dirt_count:
-            self.dirt_list[i][2] *= 0.95
-            if self.dirt_list[i][2] <= 2:
-                self.dirt_list.pop(i)
-                dirt_count -= 1
-            else: i += 1
+        self.dirt_list.remove_if(fade_dirt)
         for link in self.links:
             link.update(time_passed)
         if (self.links[-1].pos.y > self.ground_y + self.head.radius and
             self.head.velocity.length > self.head.avg_speed + 1):
             self.new_dirt(self.links[-1].pos)
 
-    def draw_dirt(self, pos, color, size):
-        pos = vec2d(pos)
-        scale = 1.0 * size / self.dirt_duration
-        size = int(self.head.radius*scale)
-        pos = self.camera.world_to_screen(pos)
-        pos.x, pos.y = int(pos.x), int(pos.y)
-        pygame.draw.circle(self.screen, color, pos, size)
+    def mark_dirty(self, tracker):
+        self.head.mark_dirty(tracker)
+        for link in self.links:
+            link.mark_dirty(tracker)
+        self.fangs.mark_dirty(tracker)
+        if self.dirt_list:
+            radius = self.head.radius
+            xs = [pos.x for pos, color, duration in self.dirt_list]
+            ys = [pos.y for pos, color, duration in self.dirt_list]
+            cam_x, cam_y = self.camera.draw_pos.x, self.camera.draw_pos.y
+            tracker.add_bounds(int(min(xs) - cam_x) - radius,
+                               int(min(ys) - cam_y) - radius,
+                               int(max(xs) - cam_x) + radius,
+                               int(max(ys) - cam_y) + radius)
 
     def draw_dirts(self):
-        for pos, color, duration in self.dirt_list:
-            self.draw_dirt(pos, color, duration)
+        if not self.dirt_list: return
+        dirts = list(self.dirt_list)
+        world = np.array([(pos.x, pos.y) for pos, color, duration in dirts])
+        scales = np.array([duration for pos, color, duration in dirts],
+                          dtype=float) / self.dirt_duration
+        sizes = (self.head.radius * scales).astype(int)
+        rects = np.column_stack((world - sizes[:, None], sizes*2, sizes*2))
+        index = np.flatnonzero(self.camera.rects_on_screen(rects))
+        points = self.camera.world_to_screen_array(world[index]).astype(int)
+        screen, circle = self.screen, pygame.draw.circle
+        for i, (x, y), size in zip(index.tolist(), points.tolist(),
+                                   sizes[index].tolist()):
+            circle(screen, dirts[i][1], (x, y), size)
+
+    # pieces in drawing order, tail first #
+    def pieces(self):
+        return self.links[::-1] + [self.head]
 
     def draw(self):
-        for link in reversed(self.links):
-            link.blit_me()
-        self.head.blit_me()
+        pieces = self.pieces()
+        for piece in self.camera.cull(pieces,
+                                      [p.draw_bounds() for p in pieces]):
+            piece.blit_me()
         self.fangs.blit_me()
\ No newline at end of file